@@ -0,0 +1,257 @@
+"""Локальная замена реестра pd.rkn.gov.ru для замеров без обращения к сайту.
+
+Отдает страницу поиска с формой, страницу результатов с таблицей #ResList1
+и карточку оператора со строками ответственного лица и контактов. Задержка
+ответа и доля ошибок 503 настраиваются.
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from html import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from registry_parser import RESPONSIBLE_LABEL, CONTACTS_LABEL  # noqa: E402
+
+LIST_PATH = '/operators-registry/operators-list/'
+
+OPERATOR_TYPES = ['юридическое лицо', 'индивидуальный предприниматель', 'физическое лицо',
+                  'государственный орган']
+
+# Оформление страниц: стили, шрифт и картинка, как на настоящем сайте
+STATIC_CSS = """@font-face { font-family: "Registry"; src: url("/static/registry.woff2") format("woff2"); }
+body { font-family: "Registry", sans-serif; }
+""" + ''.join(f".block-{index} {{ margin: 0; padding: 0; }}\n" for index in range(1500))
+STATIC_ASSETS = {
+    '/static/style.css': ('text/css; charset=utf-8', None),
+    '/static/logo.png': ('image/png', 60000),
+    '/static/registry.woff2': ('font/woff2', 40000)
+}
+HEAD_RESOURCES = """<link rel="stylesheet" href="/static/style.css">"""
+BODY_RESOURCES = """<img src="/static/logo.png" alt="РКН">"""
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html lang="ru">
+<head><meta charset="utf-8"><title>Реестр операторов</title>{head}</head>
+<body>
+{body}
+<div class="header">{padding}</div>
+<form action="{path}" method="get" id="search_form">
+    <input type="hidden" name="act" value="search">
+    <input type="text" name="name_full" value="">
+    <input type="text" name="inn" value="{inn}">
+    <input type="submit" value="Найти">
+</form>
+{content}
+</body>
+</html>
+"""
+
+DETAIL_TEMPLATE = """<!DOCTYPE html>
+<html lang="ru">
+<head><meta charset="utf-8"><title>Карточка оператора</title>{head}</head>
+<body>
+{body}
+<div class="header">{padding}</div>
+<table class="TblList">
+<tr><td>Регистрационный номер</td><td>{reg_number}</td></tr>
+<tr><td>Наименование оператора</td><td>{name}</td></tr>
+<tr><td>{responsible_label}</td><td>{responsible}</td></tr>
+<tr><td>{contacts_label}</td><td>{contacts}</td></tr>
+</table>
+</body>
+</html>
+"""
+
+
+def operator_for(inn, found_ratio=0.8):
+    """Детерминированная запись оператора для ИНН или None (не найден)"""
+    seed = sum(ord(char) * (idx + 1) for idx, char in enumerate(inn))
+    rnd = random.Random(seed)
+    if rnd.random() >= found_ratio:
+        return None
+    number = seed % 1000000
+    return {
+        'reg_number': f"{rnd.randint(10, 99)}-{rnd.randint(10, 24)}-{number:06d}",
+        'name': f'ООО "Тестовый оператор {number}"',
+        'inn': inn,
+        'operator_type': rnd.choice(OPERATOR_TYPES),
+        'inclusion_basis': 'п. 1 ч. 2 ст. 22',
+        'registration_date': f"{rnd.randint(1, 28):02d}.{rnd.randint(1, 12):02d}.{rnd.randint(2009, 2024)}",
+        'processing_start_date': f"{rnd.randint(1, 28):02d}.{rnd.randint(1, 12):02d}.{rnd.randint(2000, 2009)}",
+        'responsible': f"Иванов Иван Иванович {number}",
+        'contacts': f"г. Москва, ул. Тестовая, д. {number % 100}<br>+7 (495) 000-{number % 10000:04d}<br>"
+                    f"info{number}@example.ru"
+    }
+
+
+def results_table(operator):
+    rows = ['<tr><th>Рег. номер</th><th>Наименование, ИНН</th><th>Тип оператора</th>'
+            '<th>Основание</th><th>Дата регистрации</th><th>Дата начала обработки</th></tr>']
+    if operator:
+        rows.append(
+            f"<tr><td>{operator['reg_number']}</td>"
+            f"<td><a href=\"?id={operator['reg_number']}\">{escape(operator['name'])}</a><br>"
+            f"ИНН: {operator['inn']}</td>"
+            f"<td>{operator['operator_type']}</td><td>{operator['inclusion_basis']}</td>"
+            f"<td>{operator['registration_date']}</td><td>{operator['processing_start_date']}</td></tr>")
+    return '<table id="ResList1"><tbody>' + '\n'.join(rows) + '</tbody></table>'
+
+
+class MockRegistry:
+    """HTTP-сервер в фоновом потоке.
+
+    latency/jitter - задержка ответа в секундах (равномерно latency ± jitter),
+    error_rate - доля ответов 503 с Retry-After, found_ratio - доля найденных
+    ИНН, padding - размер балластной разметки на странице, байт,
+    assets - подключать к страницам стили, шрифт и картинку.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.05, jitter=0.02, error_rate=0.0,
+                 found_ratio=0.8, padding=20000, assets=True, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.found_ratio = found_ratio
+        self.padding = '<span>реестр операторов</span>' * (padding // 32)
+        self.resources = {'head': HEAD_RESOURCES, 'body': BODY_RESOURCES} if assets else {'head': '', 'body': ''}
+        self.assets = {
+            path: (content_type, STATIC_CSS.encode('utf-8') if size is None else bytes(size))
+            for path, (content_type, size) in STATIC_ASSETS.items()
+        }
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        # Операторы, уже выданные поиском: карточка открывается по рег. номеру
+        self.operators = {}
+        self.reset_stats()
+        self.server = ThreadingHTTPServer((host, port), self.make_handler())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}{LIST_PATH}"
+
+    def reset_stats(self):
+        with self.lock:
+            self.requests = 0
+            self.errors = 0
+            self.asset_requests = 0
+            self.bytes_sent = 0
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def respond(self, path, query):
+        """(код, тип содержимого, тело) ответа на запрос"""
+        if path in self.assets:
+            # Оформление отдается без ошибок и задержки
+            with self.lock:
+                self.asset_requests += 1
+            return (200, *self.assets[path])
+        status, body = self.respond_page(path, query)
+        return status, 'text/html; charset=utf-8', body.encode('utf-8')
+
+    def respond_page(self, path, query):
+        with self.lock:
+            self.requests += 1
+            delay = max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter))
+            failed = self.random.random() < self.error_rate
+            if failed:
+                self.errors += 1
+        time.sleep(delay)
+        if failed:
+            return 503, 'Service Unavailable'
+        if path != LIST_PATH:
+            return 404, 'Not Found'
+
+        if 'id' in query:
+            with self.lock:
+                operator = self.operators.get(query['id'][0])
+            if operator is None:
+                return 404, 'Not Found'
+            return 200, DETAIL_TEMPLATE.format(
+                padding=self.padding,
+                **self.resources,
+                reg_number=escape(operator['reg_number']),
+                name=escape(operator['name']),
+                responsible_label=RESPONSIBLE_LABEL,
+                responsible=operator['responsible'],
+                contacts_label=CONTACTS_LABEL,
+                contacts=operator['contacts'])
+
+        inn = query.get('inn', [''])[0].strip()
+        operator = operator_for(inn, self.found_ratio) if inn else None
+        if operator:
+            with self.lock:
+                self.operators[operator['reg_number']] = operator
+        content = results_table(operator) if inn else ''
+        return 200, PAGE_TEMPLATE.format(padding=self.padding, path=LIST_PATH, **self.resources,
+                                         inn=escape(inn), content=content)
+
+    def make_handler(self):
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def handle_request(self, body_query=''):
+                url = urlsplit(self.path)
+                query = parse_qs(url.query)
+                query.update(parse_qs(body_query))
+                status, content_type, data = registry.respond(url.path, query)
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(data)))
+                if status == 503:
+                    self.send_header('Retry-After', '1')
+                self.end_headers()
+                self.wfile.write(data)
+                with registry.lock:
+                    registry.bytes_sent += len(data)
+
+            def do_GET(self):
+                self.handle_request()
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                self.handle_request(self.rfile.read(length).decode('utf-8'))
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Локальная замена реестра операторов ПД")
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--latency', type=float, default=0.05, help="задержка ответа, с")
+    parser.add_argument('--jitter', type=float, default=0.02, help="разброс задержки, с")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="доля ответов 503")
+    parser.add_argument('--found-ratio', type=float, default=0.8, help="доля найденных ИНН")
+    args = parser.parse_args()
+    registry = MockRegistry(port=args.port, latency=args.latency, jitter=args.jitter,
+                            error_rate=args.error_rate, found_ratio=args.found_ratio)
+    print(f"Реестр доступен по адресу {registry.base_url}")
+    try:
+        registry.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,227 @@
+"""Замер пропускной способности проверки на локальной замене реестра.
+
+Пример:
+    python benchmarks/run_benchmark.py -e http -n 200 -c 1,2,4,8 --latency 0.05 --error-rate 0.02
+
+Для каждого числа потоков прогоняет N ИНН через конвейер поиска и карточек
+и выводит перцентили времени проверки одного ИНН, пропускную способность,
+пиковое потребление памяти, а затем время формирования XML и Excel-отчетов.
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pd_checker  # noqa: E402
+from pd_checker import ENGINES, create_engine, create_xml_report, create_excel_report  # noqa: E402
+from worker_pool import TwoStagePipeline, DETAILS_ALL, DETAILS_NONE  # noqa: E402
+from rate_limiter import RateLimiter  # noqa: E402
+from reports import result_status  # noqa: E402
+from metrics import METRICS  # noqa: E402
+from mock_registry import MockRegistry  # noqa: E402
+
+try:
+    import resource
+except ImportError:
+    # Windows: пиковая память не измеряется
+    resource = None
+
+
+def peak_rss_mb():
+    """Пиковый RSS процесса и дочерних процессов (браузеры selenium), МБ"""
+    if resource is None:
+        return None
+    # Linux отдает килобайты, macOS - байты
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return round(own / scale, 1), round(children / scale, 1)
+
+
+def percentile(values, p):
+    """Перцентиль по методу ближайшего ранга"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(p / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+def make_inns(count):
+    return [f"77{index:08d}" for index in range(1, count + 1)]
+
+
+class TimedEngine:
+    """Обертка движка: запоминает момент начала проверки каждого ИНН"""
+
+    def __init__(self, engine, started):
+        self.engine = engine
+        self.started = started
+        self.name = engine.name
+
+    def search(self, inn):
+        self.started.setdefault(inn, time.perf_counter())
+        return self.engine.search(inn)
+
+    def fetch_details(self, inn, result):
+        return self.engine.fetch_details(inn, result)
+
+    def check(self, inn):
+        self.started.setdefault(inn, time.perf_counter())
+        return self.engine.check(inn)
+
+    def close(self):
+        self.engine.close()
+
+
+def run_once(engine_name, engine_options, inns, concurrency, details, rate):
+    """Один прогон конвейера; возвращает (метрики, результаты)"""
+    started = {}
+    latencies = []
+    lock = threading.Lock()
+    limiter = RateLimiter(rate, max(1, int(rate)))
+
+    def on_result(index, result, completed, total):
+        with lock:
+            latencies.append(time.perf_counter() - started[result['inn']])
+
+    pipeline = TwoStagePipeline(
+        lambda stage_limiter: TimedEngine(
+            create_engine(engine_name, rate_limiter=stage_limiter, **engine_options), started),
+        search_workers=concurrency,
+        detail_workers=concurrency,
+        details=details,
+        on_result=on_result,
+        search_limiter=limiter,
+        detail_limiter=limiter)
+
+    METRICS.reset()
+    began = time.perf_counter()
+    try:
+        results = pipeline.run(inns)
+    finally:
+        pipeline.stop()
+    elapsed = time.perf_counter() - began
+
+    statuses = {}
+    for result in results:
+        status = result_status(result)
+        statuses[status] = statuses.get(status, 0) + 1
+    snapshot = METRICS.snapshot()
+    transferred = snapshot['counters'].get('browser.bytes', snapshot['counters'].get('http.bytes', 0))
+    metrics = {
+        'concurrency': concurrency,
+        'inns': len(inns),
+        'elapsed_s': round(elapsed, 3),
+        'throughput_per_min': round(len(results) / elapsed * 60, 1) if elapsed else None,
+        'latency_p50_s': percentile(latencies, 50),
+        'latency_p90_s': percentile(latencies, 90),
+        'latency_p99_s': percentile(latencies, 99),
+        'latency_max_s': max(latencies) if latencies else None,
+        'statuses': statuses,
+        # Байты страниц, загруженные движком (для selenium - вместе с ресурсами страниц)
+        'kb_per_inn': round(transferred / 1024 / len(inns), 1) if inns else None,
+        'peak_rss_mb': peak_rss_mb(),
+        # Время по этапам проверки из общих метрик
+        'phases': snapshot['timers'],
+        'counters': snapshot['counters']
+    }
+    return metrics, results
+
+
+def time_reports(results, rows):
+    """Время формирования XML и Excel-отчетов на rows результатах"""
+    if not results:
+        return {}
+    sample = [results[index % len(results)] for index in range(rows)]
+    timings = {'rows': rows}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, builder, filename in (('xml', create_xml_report, 'report.xml'),
+                                        ('excel', create_excel_report, 'report.xlsx')):
+            path = os.path.join(tmp, filename)
+            began = time.perf_counter()
+            builder(sample, None, path)
+            timings[f"{name}_s"] = round(time.perf_counter() - began, 3)
+            timings[f"{name}_bytes"] = os.path.getsize(path)
+    timings['peak_rss_mb'] = peak_rss_mb()
+    return timings
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Замер проверки на локальной замене реестра")
+    parser.add_argument('-e', '--engine', choices=[name for name in ENGINES if name != 'index'],
+                        default='http', help="движок проверки (по умолчанию http)")
+    parser.add_argument('-n', '--inns', type=int, default=100, help="количество ИНН")
+    parser.add_argument('-c', '--concurrency', default='1,2,4,8',
+                        help="числа потоков через запятую (по умолчанию 1,2,4,8)")
+    parser.add_argument('--details', choices=[DETAILS_ALL, DETAILS_NONE], default=DETAILS_ALL)
+    parser.add_argument('--rate', type=float, default=1000.0,
+                        help="лимит запросов в секунду (по умолчанию практически без лимита)")
+    parser.add_argument('--latency', type=float, default=0.05, help="задержка ответа сервера, с")
+    parser.add_argument('--jitter', type=float, default=0.02, help="разброс задержки, с")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="доля ответов 503")
+    parser.add_argument('--found-ratio', type=float, default=0.8, help="доля найденных ИНН")
+    parser.add_argument('--full-browser', action='store_true',
+                        help="selenium без облегченного режима (для сравнения объема загрузки)")
+    parser.add_argument('--report-rows', type=int, default=10000,
+                        help="строк в замере отчетов, 0 - без замера")
+    parser.add_argument('--json', help="сохранить результаты замера в JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    inns = make_inns(args.inns)
+    report = {'engine': args.engine, 'details': args.details, 'runs': []}
+    engine_options = {}
+    if args.engine == 'selenium':
+        engine_options['lean'] = not args.full_browser
+        report['lean'] = engine_options['lean']
+        # Трафик браузера по страницам нужен для столбца КБ/ИНН
+        pd_checker.MEASURE_PAGE_TRANSFER = True
+    results = []
+
+    with MockRegistry(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                      found_ratio=args.found_ratio, seed=1) as registry:
+        print(f"Замена реестра: {registry.base_url}")
+        print(f"{'потоков':>8} {'ИНН/мин':>10} {'p50, с':>8} {'p90, с':>8} {'p99, с':>8} "
+              f"{'запросов':>9} {'503':>5} {'КБ/ИНН':>8} {'RSS, МБ':>10}")
+        for concurrency in [int(value) for value in args.concurrency.split(',')]:
+            registry.reset_stats()
+            # Журнал движков не нужен в выводе замера
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                metrics, results = run_once(args.engine, dict(engine_options, base_url=registry.base_url), inns,
+                                            concurrency, args.details, args.rate)
+            metrics['requests'] = registry.requests
+            metrics['injected_errors'] = registry.errors
+            metrics['bytes_sent'] = registry.bytes_sent
+            report['runs'].append(metrics)
+            rss = metrics['peak_rss_mb']
+            print(f"{concurrency:>8} {metrics['throughput_per_min']:>10} "
+                  f"{metrics['latency_p50_s'] or 0:>8.3f} {metrics['latency_p90_s'] or 0:>8.3f} "
+                  f"{metrics['latency_p99_s'] or 0:>8.3f} {registry.requests:>9} {registry.errors:>5} "
+                  f"{metrics['kb_per_inn']:>8} "
+                  f"{rss[0] if rss else '-':>10}")
+
+    if args.report_rows:
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            report['reports'] = time_reports(results, args.report_rows)
+        timings = report['reports']
+        if timings:
+            print(f"Отчеты на {timings['rows']} строк: XML {timings['xml_s']} с, "
+                  f"Excel {timings['excel_s']} с")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Результаты замера сохранены в {args.json}")
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+"""Консольный запуск проверки для пакетной обработки: ИНН из файла или stdin, JSONL на выходе"""
+import argparse
+import json
+import os
+import sys
+import threading
+from pd_checker import ENGINES, create_engine, engine_uses_cache, create_excel_report
+from worker_pool import TwoStagePipeline, DETAILS_ALL, DETAILS_NONE
+from rate_limiter import RATE_LIMITER, RateLimiter
+from result_cache import ResultCache, DEFAULT_CACHE_PATH
+from registry_index import DEFAULT_INDEX_PATH
+from reports import XmlReportWriter, result_status
+from run_journal import write_failed_list
+from inn_input import open_input_values, iter_line_values, iter_inn_records, invalid_result
+from retry_policy import RetryPolicy
+from snapshot_diff import load_snapshot, SnapshotEngine, diff_result, describe_changes, write_changes_report
+from parquet_store import ParquetResultStore
+from metrics import METRICS
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Проверка ИНН по реестру операторов персональных данных (pd.rkn.gov.ru)")
+    parser.add_argument('-i', '--input', default='-',
+                        help="файл с ИНН: TXT по одному на строку, CSV или XLSX; '-' - stdin (по умолчанию)")
+    parser.add_argument('--column',
+                        help="столбец с ИНН в CSV/XLSX: номер (с 1) или заголовок; "
+                             "по умолчанию столбец с \"ИНН\" в заголовке")
+    parser.add_argument('--sheet', help="лист XLSX (по умолчанию активный)")
+    parser.add_argument('-o', '--output', default='-',
+                        help="файл JSONL с результатами; '-' - stdout (по умолчанию)")
+    parser.add_argument('-e', '--engine', choices=list(ENGINES), default='selenium',
+                        help="движок проверки (по умолчанию selenium)")
+    parser.add_argument('-w', '--workers', type=int, default=1,
+                        help="потоков поиска (по умолчанию 1)")
+    parser.add_argument('--detail-workers', type=int, default=None,
+                        help="потоков загрузки карточек (по умолчанию как --workers)")
+    parser.add_argument('--details', choices=[DETAILS_ALL, DETAILS_NONE], default=DETAILS_ALL,
+                        help="all - загружать карточки, none - только наличие в реестре")
+    parser.add_argument('-r', '--rate', type=float, default=1.0,
+                        help="лимит запросов в секунду для всех потоков (по умолчанию 1)")
+    parser.add_argument('--burst', type=int, default=2,
+                        help="допустимый всплеск запросов (по умолчанию 2)")
+    parser.add_argument('--detail-rate', type=float, default=None,
+                        help="отдельный лимит запросов для карточек")
+    parser.add_argument('--retries', type=int, default=3,
+                        help="попыток на ИНН при временных сбоях (по умолчанию 3)")
+    parser.add_argument('--retry-delay', type=float, default=2.0,
+                        help="пауза перед первым повтором, секунд; далее удваивается (по умолчанию 2)")
+    parser.add_argument('--failed',
+                        help="записать ИНН с ошибкой проверки в CSV для повторного запуска (-i файл)")
+    parser.add_argument('--cache', default=DEFAULT_CACHE_PATH,
+                        help=f"файл кэша результатов (по умолчанию {DEFAULT_CACHE_PATH})")
+    parser.add_argument('--no-cache', action='store_true', help="не использовать кэш")
+    parser.add_argument('--cache-ttl', type=float, default=7 * 24 * 3600,
+                        help="срок жизни найденных записей кэша, секунд")
+    parser.add_argument('--negative-ttl', type=float, default=24 * 3600,
+                        help="срок жизни записей кэша \"не найден\", секунд")
+    parser.add_argument('--index', default=DEFAULT_INDEX_PATH,
+                        help="файл локального индекса для движка index")
+    parser.add_argument('--xml', help="дополнительно записать XML-отчет")
+    parser.add_argument('--xlsx', help="дополнительно записать Excel-отчет (результаты держатся в памяти)")
+    parser.add_argument('--parquet', help="дополнительно записать Parquet")
+    parser.add_argument('--partition-by-date', action='store_true',
+                        help="--parquet - каталог набора данных с подкаталогом run_date=ГГГГ-ММ-ДД")
+    parser.add_argument('--previous',
+                        help="прошлый отчет (XML, XLSX, Parquet или журнал JSONL): карточки загружаются "
+                             "только для операторов с новым номером или датой регистрации")
+    parser.add_argument('--changes', default='changes.xlsx',
+                        help="отчет об изменениях относительно --previous: *.xlsx или CSV "
+                             "(по умолчанию changes.xlsx)")
+    parser.add_argument('--metrics',
+                        help="сохранить замеры по этапам: *.prom - формат Prometheus, иначе JSON")
+    parser.add_argument('-q', '--quiet', action='store_true', help="не выводить журнал работы")
+    return parser.parse_args(argv)
+
+
+def iter_inns(records, on_invalid, on_repeat, rows):
+    """Корректные ИНН без повторов по мере чтения; некорректные сразу уходят в on_invalid,
+    повторные вхождения - в on_repeat.
+
+    rows заполняется списком строк для каждого ИНН, начиная со строки первого вхождения.
+    """
+    seen = set()
+    for record in records:
+        if record.error is not None:
+            on_invalid(record)
+        elif record.inn in seen:
+            on_repeat(record)
+        else:
+            seen.add(record.inn)
+            rows[record.inn] = [record.row]
+            yield record.inn
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    # Файл читается потоково: CSV/XLSX построчно, без загрузки целиком. Открывается
+    # он до запуска конвейера, чтобы ошибка в имени файла, листа или столбца не терялась
+    try:
+        values = iter_line_values(sys.stdin) if args.input == '-' else \
+            open_input_values(args.input, args.column, args.sheet)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Не удалось прочитать входной файл {args.input}: {e}", file=sys.stderr)
+        return 2
+
+    # stdout занят под JSONL, поэтому журнал работы уходит в stderr
+    saved_stdout = sys.stdout
+    output = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+    sys.stdout = open(os.devnull, 'w') if args.quiet else sys.stderr
+
+    METRICS.reset()
+    RATE_LIMITER.configure(args.rate, args.burst)
+    detail_limiter = RateLimiter(args.detail_rate, args.burst) if args.detail_rate else RATE_LIMITER
+    cache = None if args.no_cache or not engine_uses_cache(args.engine) else ResultCache(args.cache, ttl=args.cache_ttl,
+                                                   negative_ttl=args.negative_ttl)
+    engine_options = {'index_path': args.index} if args.engine == 'index' else {}
+    # Прошлый отчет читается до записи новых: это может быть тот же файл
+    snapshot = load_snapshot(args.previous) if args.previous else None
+    if snapshot is not None:
+        print(f"Загружен прошлый отчет {args.previous}: {len(snapshot)} ИНН")
+    changes = []
+
+    xml_writer = XmlReportWriter(args.xml).open() if args.xml else None
+    parquet_store = (ParquetResultStore(args.parquet, partition_by_date=args.partition_by_date)
+                     if args.parquet else None)
+    collected = {} if args.xlsx else None
+    output_lock = threading.Lock()
+    # Строки входного файла каждого ИНН, еще не попавшие в отчеты: у повторяющегося
+    # ИНН своя запись XML, Excel и Parquet на каждое вхождение, порядок - по строкам
+    rows = {}
+    # Результаты проверенных ИНН для повторов, встреченных уже после проверки
+    checked = {} if xml_writer or parquet_store or collected is not None else None
+    # Результаты с ошибкой проверки: их немного, держатся в памяти до записи списка
+    failed = []
+
+    def write_rows(result, result_rows):
+        # XML, Excel и Parquet - по записи на каждую строку входного файла, как в pd_checker.py
+        if collected is not None:
+            with output_lock:
+                for row in result_rows:
+                    collected[row] = result
+        for _ in result_rows:
+            if xml_writer:
+                xml_writer.write(result)
+            if parquet_store:
+                parquet_store.write(result)
+
+    def emit(result, result_rows):
+        # Каждая запись уходит на выход сразу после проверки ИНН
+        record = {'inn': result['inn'], 'status': result_status(result), 'data': result['data']}
+        if result.get('error'):
+            record['error'] = result['error']
+        line = json.dumps(record, ensure_ascii=False)
+        with output_lock:
+            output.write(line + '\n')
+            output.flush()
+            if result_status(result) == 'error':
+                failed.append(result)
+            if snapshot is not None:
+                changes.extend(diff_result(snapshot, result))
+        write_rows(result, result_rows)
+
+    def on_result(index, result, completed, total):
+        with output_lock:
+            result_rows = rows.pop(result['inn'])
+            if checked is not None:
+                checked[result['inn']] = result
+        emit(result, result_rows)
+
+    def on_repeat(record):
+        # Повтор не проверяется заново: до проверки он ждет результата вместе с первым
+        # вхождением, после - сразу получает готовый результат
+        with output_lock:
+            result = checked.get(record.inn) if checked is not None else None
+            if result is None:
+                if record.inn in rows:
+                    rows[record.inn].append(record.row)
+                return
+        write_rows(result, [record.row])
+
+    def on_invalid(record):
+        # Некорректный ИНН в реестр не отправляется
+        print(f"Строка {record.row}: ИНН {record.raw} пропущен - {record.error}")
+        emit(invalid_result(record), [record.row])
+
+    def make_engine(limiter):
+        engine = create_engine(args.engine, cache, rate_limiter=limiter, **engine_options)
+        return SnapshotEngine(engine, snapshot) if snapshot is not None else engine
+
+    pipeline = TwoStagePipeline(
+        make_engine,
+        search_workers=args.workers,
+        detail_workers=args.detail_workers or args.workers,
+        details=args.details,
+        on_result=on_result,
+        search_limiter=RATE_LIMITER,
+        detail_limiter=detail_limiter,
+        retry=RetryPolicy(args.retries, args.retry_delay))
+
+    exit_code = 0
+    try:
+        pipeline.run_stream(iter_inns(iter_inn_records(values), on_invalid, on_repeat, rows))
+        if args.xlsx:
+            create_excel_report([collected[index] for index in sorted(collected)], cache, args.xlsx)
+        if failed:
+            # Код возврата 1: часть ИНН не проверена из-за сбоев
+            print(f"Не удалось проверить ИНН: {len(failed)}")
+            exit_code = 1
+        if args.failed:
+            write_failed_list(args.failed, failed)
+        if snapshot is not None:
+            write_changes_report(changes, args.changes)
+            print(f"Отчет об изменениях: {args.changes} ({describe_changes(changes)})")
+    except KeyboardInterrupt:
+        print("Проверка прервана")
+        exit_code = 130
+    finally:
+        pipeline.stop()
+        if xml_writer:
+            xml_writer.close()
+        if parquet_store:
+            parquet_store.close()
+        if cache:
+            print(cache.summary())
+            cache.close()
+        print(METRICS.summary())
+        if args.metrics:
+            METRICS.export(args.metrics)
+        if hasattr(values, 'close'):
+            values.close()
+        if output is not saved_stdout:
+            output.close()
+        if args.quiet:
+            sys.stdout.close()
+        sys.stdout = saved_stdout
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,232 @@
+"""Распределенная проверка: координатор раздает ИНН воркерам через общую очередь SQLite.
+
+Координатор кладет ИНН в очередь и собирает результаты в обычные отчеты:
+    python distributed.py coordinator -i inn.txt --queue /share/pd_queue.sqlite3
+Воркеры (на этой или других машинах с доступом к файлу очереди) берут ИНН
+в аренду, проверяют любым движком и возвращают результаты:
+    python distributed.py worker --queue /share/pd_queue.sqlite3 -e selenium -w 2
+"""
+import argparse
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+from collections import Counter
+from pd_checker import ENGINES, create_engine, engine_uses_cache, create_excel_report
+from worker_pool import TwoStagePipeline, DETAILS_ALL, DETAILS_NONE
+from rate_limiter import RATE_LIMITER
+from result_cache import ResultCache, DEFAULT_CACHE_PATH
+from registry_index import DEFAULT_INDEX_PATH
+from retry_policy import RetryPolicy
+from reports import XmlReportWriter, status_label
+from inn_input import read_inn_records, unique_inns, fan_out, invalid_result, describe_records
+from run_journal import failed_path_for, write_failed_list
+from work_queue import WorkQueue, DEFAULT_QUEUE_PATH
+from metrics import METRICS
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Распределенная проверка ИНН: координатор и воркеры с общей очередью SQLite")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    coordinator = commands.add_parser('coordinator', help="раздать ИНН и собрать отчеты")
+    coordinator.add_argument('-i', '--input', default='inn.txt',
+                             help="файл с ИНН: TXT, CSV или XLSX (по умолчанию inn.txt)")
+    coordinator.add_argument('--column', help="столбец с ИНН в CSV/XLSX: номер (с 1) или заголовок")
+    coordinator.add_argument('--queue', default=DEFAULT_QUEUE_PATH,
+                             help=f"файл очереди (по умолчанию {DEFAULT_QUEUE_PATH})")
+    coordinator.add_argument('--restart', action='store_true',
+                             help="очистить очередь; иначе продолжить с уже полученными результатами")
+    coordinator.add_argument('--max-attempts', type=int, default=3,
+                             help="сколько раз выдавать ИНН воркерам при сбоях (по умолчанию 3)")
+    coordinator.add_argument('--poll', type=float, default=1.0, help="период опроса очереди, секунд")
+    coordinator.add_argument('--xml', default='report.xml', help="XML-отчет (по умолчанию report.xml)")
+    coordinator.add_argument('--xlsx', default='report.xlsx', help="Excel-отчет (по умолчанию report.xlsx)")
+
+    worker = commands.add_parser('worker', help="проверять ИНН из очереди")
+    worker.add_argument('--queue', default=DEFAULT_QUEUE_PATH,
+                        help=f"файл очереди (по умолчанию {DEFAULT_QUEUE_PATH})")
+    worker.add_argument('--worker-id', help="имя воркера (по умолчанию хост-pid)")
+    worker.add_argument('-e', '--engine', choices=list(ENGINES), default='selenium',
+                        help="движок проверки (по умолчанию selenium)")
+    worker.add_argument('-w', '--workers', type=int, default=1, help="потоков поиска (по умолчанию 1)")
+    worker.add_argument('--details', choices=[DETAILS_ALL, DETAILS_NONE], default=DETAILS_ALL,
+                        help="all - загружать карточки, none - только наличие в реестре")
+    worker.add_argument('-r', '--rate', type=float, default=1.0,
+                        help="лимит запросов в секунду этого воркера (по умолчанию 1)")
+    worker.add_argument('--burst', type=int, default=2, help="допустимый всплеск запросов (по умолчанию 2)")
+    worker.add_argument('--retries', type=int, default=3,
+                        help="попыток на ИНН при временных сбоях (по умолчанию 3)")
+    worker.add_argument('--lease', type=float, default=300,
+                        help="срок аренды задания, секунд; продлевается, пока воркер жив (по умолчанию 300)")
+    worker.add_argument('--poll', type=float, default=2.0, help="пауза при пустой очереди, секунд")
+    worker.add_argument('--cache', default=DEFAULT_CACHE_PATH,
+                        help=f"файл кэша результатов (по умолчанию {DEFAULT_CACHE_PATH})")
+    worker.add_argument('--no-cache', action='store_true', help="не использовать кэш")
+    worker.add_argument('--index', default=DEFAULT_INDEX_PATH,
+                        help="файл локального индекса для движка index")
+    worker.add_argument('--base-url', help="адрес списка операторов (например, локальной замены реестра)")
+    return parser.parse_args(argv)
+
+
+def call_queue(func, stop_event, retry, *args):
+    """Обращение к очереди с повтором, пока файл очереди занят или недоступен.
+
+    Общий каталог может быть недоступен минутами: воркер ждет с растущей
+    паузой, а не завершается. При остановке воркера поднимается последняя ошибка.
+    """
+    attempt = 0
+    while True:
+        try:
+            return func(*args)
+        except sqlite3.OperationalError as e:
+            attempt += 1
+            delay = retry.delay(attempt)
+            print(f"Очередь недоступна: {str(e)}. Повтор через {delay:.1f} с")
+            if stop_event.wait(delay):
+                raise
+
+
+def iter_leased(queue, worker_id, batch, lease_seconds, poll, stop_event, retry):
+    """ИНН, взятые в аренду; при пустой очереди ждет, пока координатор не получит все результаты"""
+    while not stop_event.is_set():
+        inns = call_queue(queue.lease, stop_event, retry, worker_id, batch, lease_seconds)
+        if inns:
+            yield from inns
+        elif call_queue(queue.finished, stop_event, retry):
+            return
+        else:
+            stop_event.wait(poll)
+
+
+def keep_leases(queue, worker_id, lease_seconds, stop_event, retry):
+    """Продлевает аренду заданий воркера, пока он работает"""
+    while not stop_event.wait(lease_seconds / 3):
+        try:
+            call_queue(queue.heartbeat, stop_event, retry, worker_id, lease_seconds)
+        except Exception as e:
+            print(f"Не удалось продлить аренду: {str(e)}")
+
+
+def run_worker(args):
+    worker_id = args.worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    queue = WorkQueue(args.queue)
+    RATE_LIMITER.configure(args.rate, args.burst)
+    cache = None if args.no_cache or not engine_uses_cache(args.engine) else ResultCache(args.cache)
+    engine_options = {'index_path': args.index} if args.engine == 'index' else {}
+    if args.base_url and args.engine != 'index':
+        engine_options['base_url'] = args.base_url
+    stop_event = threading.Event()
+    # Пауза между обращениями к недоступной очереди: от секунды до полуминуты
+    queue_retry = RetryPolicy(base_delay=1.0, max_delay=30.0)
+
+    def on_result(index, result, completed, total):
+        note = ''
+        if not call_queue(queue.complete, stop_event, queue_retry, worker_id, result):
+            note = ' - возвращен в очередь' if result.get('status') == 'error' else ' - уже проверен другим воркером'
+        print(f"[{worker_id}] ИНН {result['inn']} {status_label(result).lower()}{note}")
+
+    pipeline = TwoStagePipeline(
+        lambda limiter: create_engine(args.engine, cache, rate_limiter=limiter, **engine_options),
+        search_workers=args.workers,
+        detail_workers=args.workers,
+        details=args.details,
+        on_result=on_result,
+        retry=RetryPolicy(args.retries))
+
+    heartbeat = threading.Thread(target=keep_leases,
+                                 args=(queue, worker_id, args.lease, stop_event, queue_retry), daemon=True)
+    heartbeat.start()
+    print(f"Воркер {worker_id}: движок {args.engine}, потоков {args.workers}, очередь {args.queue}")
+    exit_code = 0
+    try:
+        pipeline.run_stream(iter_leased(queue, worker_id, args.workers, args.lease, args.poll, stop_event,
+                                        queue_retry))
+        print(f"Воркер {worker_id}: очередь пуста, работа завершена")
+    except KeyboardInterrupt:
+        print(f"Воркер {worker_id} остановлен")
+        exit_code = 130
+    finally:
+        stop_event.set()
+        pipeline.stop()
+        # Недопроверенные задания сразу возвращаются в очередь, не дожидаясь конца аренды
+        try:
+            queue.release(worker_id)
+        except sqlite3.OperationalError as e:
+            print(f"Задания вернутся в очередь по истечении аренды: {str(e)}")
+        queue.close()
+        if cache:
+            cache.close()
+    return exit_code
+
+
+def run_coordinator(args):
+    METRICS.reset()
+    records = read_inn_records(args.input, args.column)
+    inn_list = unique_inns(records)
+    occurrences = Counter(record.inn for record in records if record.error is None)
+    invalid = [invalid_result(record) for record in records if record.error is not None]
+    print(f"Загружено из файла {args.input}: {describe_records(records)}")
+
+    queue = WorkQueue(args.queue)
+    if args.restart:
+        queue.clear()
+    queue.configure(args.max_attempts)
+    queue.add(inn_list)
+
+    # XML-отчет пишется по мере поступления результатов от воркеров
+    xml_writer = XmlReportWriter(args.xml).open()
+    xml_writer.write_all(invalid)
+    by_inn = {}
+    last_id = 0
+    last_status = 0.0
+    try:
+        while True:
+            for last_id, worker, result in queue.results_after(last_id):
+                inn = result['inn']
+                # В очереди могут остаться ИНН прошлого списка
+                if inn not in occurrences or inn in by_inn:
+                    continue
+                by_inn[inn] = result
+                for _ in range(occurrences[inn]):
+                    xml_writer.write(result)
+                print(f"[{len(by_inn)}/{len(inn_list)}] ИНН {inn} {status_label(result).lower()} ({worker})")
+            if len(by_inn) == len(inn_list):
+                break
+            if time.monotonic() - last_status >= 30:
+                last_status = time.monotonic()
+                counts = queue.counts()
+                print(f"Очередь: ожидают {counts['pending']}, в работе {counts['leased']}, "
+                      f"готово {counts['done']}")
+            time.sleep(args.poll)
+    except KeyboardInterrupt:
+        # Очередь остается в файле: повторный запуск координатора продолжит сбор
+        print("Координатор остановлен, воркеры продолжают работу")
+        return 130
+    finally:
+        xml_writer.close()
+        queue.close()
+
+    results = fan_out(records, by_inn)
+    print(f"XML-отчет сформирован в файле {args.xml} ({xml_writer.count} записей)")
+    create_excel_report(results, None, args.xlsx)
+    print(f"Excel-отчет сформирован в файле {args.xlsx}")
+    failed_path = failed_path_for(args.input)
+    failed = write_failed_list(failed_path, by_inn.values())
+    if failed:
+        print(f"Не удалось проверить ИНН: {failed}. Список для повторной проверки: {failed_path}")
+    return 0
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.command == 'worker':
+        return run_worker(args)
+    return run_coordinator(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
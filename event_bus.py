@@ -0,0 +1,85 @@
+"""Потокобезопасная передача журнала и прогресса из рабочих потоков в окно Tk"""
+import datetime
+import queue
+import threading
+
+DEFAULT_LOG_PATH = 'pd_checker_gui.log'
+
+
+class EventBus:
+    """Очередь событий интерфейса, которую главный поток разбирает пачками.
+
+    Рабочие потоки только кладут события в очередь и не трогают виджеты.
+    Строки журнала и вызовы (смена состояния кнопок и т.п.) доставляются
+    по порядку, а прогресс и статус хранят только последнее значение:
+    промежуточные обновления, не успевшие отрисоваться, не нужны.
+    """
+
+    def __init__(self):
+        self.events = queue.SimpleQueue()
+        self.lock = threading.Lock()
+        self.pending = threading.local()
+        self.progress = None
+        self.status = None
+        self.log_file = None
+
+    def log(self, message, level="INFO"):
+        timestamp = datetime.datetime.now().strftime("%H:%M:%S")
+        self.events.put(('log', f"[{timestamp}] {message}", level))
+
+    def write(self, text):
+        """Приемник print: в журнал уходят только законченные строки"""
+        buffer = getattr(self.pending, 'text', '') + text
+        *lines, self.pending.text = buffer.split('\n')
+        for line in lines:
+            self.log(line)
+
+    def flush(self):
+        pass
+
+    def set_progress(self, value):
+        with self.lock:
+            self.progress = value
+
+    def set_status(self, message):
+        with self.lock:
+            self.status = message
+
+    def call(self, func, *args):
+        """Выполнить func в главном потоке"""
+        self.events.put(('call', func, args))
+
+    def open_log_file(self, path=DEFAULT_LOG_PATH):
+        """Полный журнал дополнительно пишется в файл (в окне - только хвост)"""
+        self.close_log_file()
+        self.log_file = open(path, 'a', encoding='utf-8')
+
+    def close_log_file(self):
+        if self.log_file:
+            self.log_file.close()
+            self.log_file = None
+
+    def drain(self, max_events=500):
+        """Забирает накопленные события в порядке поступления.
+
+        Возвращает (события, прогресс, статус); событие - ('log', строка,
+        уровень) или ('call', функция, аргументы); прогресс и статус - None,
+        если не менялись с прошлого раза.
+        """
+        events = []
+        for _ in range(max_events):
+            try:
+                events.append(self.events.get_nowait())
+            except queue.Empty:
+                break
+
+        if self.log_file:
+            lines = [f"{event[1]}\n" for event in events if event[0] == 'log']
+            if lines:
+                self.log_file.write(''.join(lines))
+                self.log_file.flush()
+
+        with self.lock:
+            progress, self.progress = self.progress, None
+            status, self.status = self.status, None
+        return events, progress, status
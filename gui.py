@@ -2,11 +2,94 @@ import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 import threading
 import pandas as pd
-from pd_checker import setup_driver, check_operator_status
+from pd_checker import ENGINES, create_engine, DriverPool
+from worker_pool import TwoStagePipeline, DETAILS_ALL, DETAILS_NONE, DETAILS_LAZY
+from rate_limiter import RATE_LIMITER
+from result_cache import ResultCache, fill_details_from_cache
+from run_journal import RunJournal, journal_path_for, failed_path_for, write_failed_list
+from inn_input import read_inn_records, unique_inns, fan_out, invalid_result, describe_records
+from reports import write_excel_report, status_label
+from parquet_store import ParquetResultStore
+from event_bus import EventBus, DEFAULT_LOG_PATH
+from results_view import ResultsView
+from search_index import SearchIndex, MIN_QUERY_LENGTH
+from run_stats import RunStats, format_stats, format_duration
+from metrics import METRICS
 import os
 import sys
-import datetime
-from openpyxl.styles import PatternFill
+import traceback
+
+# Журнал в окне: сколько последних строк хранить и до какой длины обрезать строку
+LOG_MAX_LINES = 5000
+LOG_LINE_LIMIT = 2000
+# Период разбора очереди событий интерфейса, мс
+EVENTS_POLL_MS = 100
+EVENTS_BATCH = 500
+
+# Столбцы таблицы результатов и выгрузок из интерфейса
+RESULT_COLUMNS = [
+    'ИНН',
+    'Статус',
+    'Наименование',
+    'Тип оператора',
+    'Основание включения',
+    'Дата регистрации',
+    'Дата начала обработки',
+    'Ответственный за ПД',
+    'Email',
+    'Ссылка на карточку'
+]
+RESULT_COLUMN_WIDTHS = [100, 80, 250, 150, 150, 110, 110, 200, 160, 300]
+# Сколько совпадений показывать в окне поиска
+SEARCH_LIMIT = 200
+
+
+def result_row(result):
+    """Строка таблицы результатов (словарь по RESULT_COLUMNS) для одного ИНН"""
+    inn = result['inn']  # Получаем ИНН из результата
+    status = status_label(result)  # Определяем статус
+    
+    if result['data']:
+        name_inn = result['data']['name_inn']
+        name = name_inn.split('ИНН:')[0].strip()
+        
+        return {
+            'ИНН': inn,
+            'Статус': status,
+            'Наименование': name,
+            'Тип оператора': result['data']['operator_type'],
+            'Основание включения': result['data']['inclusion_basis'],
+            'Дата регистрации': result['data']['registration_date'],
+            'Дата начала обработки': result['data']['processing_start_date'],
+            'Ответственный за ПД': result['data'].get('responsible_person', 'Не указан'),
+            'Email': result['data'].get('email', ''),
+            'Ссылка на карточку': result['data'].get('url', '')
+        }
+    # Запись для ненайденного ИНН
+    row = {column: '-' for column in RESULT_COLUMNS}
+    row['ИНН'] = inn
+    row['Статус'] = status
+    return row
+
+
+def result_values(result):
+    row = result_row(result)
+    return [row[column] for column in RESULT_COLUMNS]
+
+
+def search_fields(result):
+    """Поля, по которым ищет окно поиска"""
+    data = result['data'] or {}
+    return [
+        result['inn'],
+        data.get('reg_number'),
+        data.get('name_inn'),
+        data.get('operator_type'),
+        data.get('inclusion_basis'),
+        data.get('registration_date'),
+        data.get('responsible_person'),
+        data.get('email')
+    ]
 
 class PDCheckerGUI:
     def __init__(self, root):
@@ -35,11 +118,23 @@ class PDCheckerGUI:
         }
         
         self.current_theme = "dark"  # Тема по умолчанию
-        self.driver = None
+        self.pool = None
+        # Браузеры selenium остаются запущенными между проверками
+        self.driver_pool = DriverPool()
+        self.cache = None
+        self.journal = None
+        self.done_results = {}
         self.results = []
+        self.records = []
+        # Индекс поиска пополняется вместе с self.results
+        self.search_index = SearchIndex(search_fields)
+        # Счетчики для окна статистики, скорости и оценки времени
+        self.stats = RunStats()
         
-        sys.stdout = self
-        sys.stderr = self
+        # print из рабочих потоков попадает в очередь, окно обновляет только главный поток
+        self.bus = EventBus()
+        sys.stdout = self.bus
+        sys.stderr = self.bus
         
         self.checker = None
         self.check_thread = None
@@ -47,6 +142,8 @@ class PDCheckerGUI:
         
         self.create_widgets()
         self.apply_theme()
+        self.root.after(EVENTS_POLL_MS, self.process_events)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
         
     def create_widgets(self):
         # Верхняя панель с кнопками и темой
@@ -64,6 +161,48 @@ class PDCheckerGUI:
                                   command=self.change_theme)
         theme_menu.pack(side=tk.LEFT, padx=5)
         
+        # Выбор движка проверки
+        engine_frame = ttk.Frame(top_frame)
+        engine_frame.pack(side=tk.LEFT, padx=5)
+        
+        ttk.Label(engine_frame, text="Движок:").pack(side=tk.LEFT)
+        self.engine_var = tk.StringVar(value="selenium")
+        engine_menu = ttk.OptionMenu(engine_frame, self.engine_var, "selenium",
+                                   *ENGINES)
+        engine_menu.pack(side=tk.LEFT, padx=5)
+        
+        ttk.Label(engine_frame, text="Потоков:").pack(side=tk.LEFT)
+        self.workers_var = tk.StringVar(value="1")
+        workers_spin = tk.Spinbox(engine_frame, from_=1, to=32, width=4,
+                                  textvariable=self.workers_var)
+        workers_spin.pack(side=tk.LEFT, padx=5)
+        
+        ttk.Label(engine_frame, text="Запросов/с:").pack(side=tk.LEFT)
+        self.rate_var = tk.StringVar(value="1.0")
+        rate_entry = ttk.Entry(engine_frame, width=5, textvariable=self.rate_var)
+        rate_entry.pack(side=tk.LEFT, padx=5)
+        
+        # Режим загрузки карточек оператора (второй этап проверки)
+        self.details_modes = {
+            "все": DETAILS_ALL,
+            "без карточек": DETAILS_NONE,
+            "по запросу": DETAILS_LAZY
+        }
+        ttk.Label(engine_frame, text="Карточки:").pack(side=tk.LEFT)
+        self.details_var = tk.StringVar(value="все")
+        details_menu = ttk.OptionMenu(engine_frame, self.details_var, "все",
+                                    *self.details_modes)
+        details_menu.pack(side=tk.LEFT, padx=5)
+        
+        self.cache_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(engine_frame, text="Кэш",
+                        variable=self.cache_var).pack(side=tk.LEFT, padx=5)
+        
+        self.log_file_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(engine_frame, text="Лог в файл",
+                        variable=self.log_file_var,
+                        command=self.toggle_log_file).pack(side=tk.LEFT, padx=5)
+        
         # Кнопки
         button_frame = ttk.Frame(self.root, padding="5")
         button_frame.pack(fill=tk.X)
@@ -75,6 +214,11 @@ class PDCheckerGUI:
                                    bd=1)
         self.select_btn.pack(side=tk.LEFT, padx=5)
         
+        # Столбец с ИНН в CSV/XLSX: номер или заголовок, пусто - по заголовку "ИНН"
+        ttk.Label(button_frame, text="Столбец:").pack(side=tk.LEFT)
+        self.column_var = tk.StringVar(value="")
+        ttk.Entry(button_frame, width=8, textvariable=self.column_var).pack(side=tk.LEFT, padx=5)
+        
         self.start_btn = tk.Button(button_frame, text="Запустить проверку",
                                   command=self.start_check,
                                   state=tk.DISABLED,
@@ -108,6 +252,18 @@ class PDCheckerGUI:
                                relief="raised",
                                bd=1)
         self.search_btn.pack(side=tk.LEFT, padx=5)
+        
+        self.metrics_btn = tk.Button(button_frame, text="Метрики",
+                                command=self.show_metrics,
+                                relief="raised",
+                                bd=1)
+        self.metrics_btn.pack(side=tk.LEFT, padx=5)
+        
+        self.details_btn = tk.Button(button_frame, text="Догрузить карточки",
+                                command=self.load_missing_details,
+                                relief="raised",
+                                bd=1)
+        self.details_btn.pack(side=tk.LEFT, padx=5)
     
         # Меню сохранения
         save_menu = tk.Menu(button_frame, tearoff=0)
@@ -117,15 +273,21 @@ class PDCheckerGUI:
                          command=lambda: self.save_results_as('csv'))
         save_menu.add_command(label="JSON", 
                          command=lambda: self.save_results_as('json'))
+        save_menu.add_command(label="Parquet", 
+                         command=lambda: self.save_results_as('parquet'))
     
         self.save_btn.configure(command=lambda: save_menu.post(
             self.save_btn.winfo_rootx(),
             self.save_btn.winfo_rooty() + self.save_btn.winfo_height()
         ))
         
+        # Вкладки: журнал и таблица результатов
+        self.notebook = ttk.Notebook(self.root)
+        self.notebook.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        
         # Область лога
-        log_frame = ttk.Frame(self.root)
-        log_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        log_frame = ttk.Frame(self.notebook)
+        self.notebook.add(log_frame, text="Журнал")
         
         self.scrollbar = ttk.Scrollbar(log_frame)
         self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
@@ -138,6 +300,19 @@ class PDCheckerGUI:
         
         self.scrollbar.config(command=self.log_text.yview)
         
+        colors = {
+            "INFO": "white",
+            "ERROR": "red",
+            "SUCCESS": "green",
+            "WARNING": "yellow"
+        }
+        for level, color in colors.items():
+            self.log_text.tag_config(level, foreground=color)
+        
+        # Таблица результатов, пополняется по мере проверки
+        self.results_view = ResultsView(self.notebook, RESULT_COLUMNS, RESULT_COLUMN_WIDTHS)
+        self.notebook.add(self.results_view, text="Результаты")
+        
         # Прогресс бар
         self.progress = ttk.Progressbar(self.root, mode='determinate')
         self.progress.pack(fill=tk.X, padx=5, pady=5)
@@ -161,16 +336,65 @@ class PDCheckerGUI:
                              padding=(5, 2))
         dev_label.pack(side=tk.RIGHT)
 
-    def write(self, text):
-        """Метод для перенаправления stdout/stderr в лог"""
-        timestamp = datetime.datetime.now().strftime("%H:%M:%S")
-        self.log_text.insert(tk.END, f"[{timestamp}] {text}")
-        self.log_text.see(tk.END)
-        self.root.update_idletasks()
-        
-    def flush(self):
-        """Требуется для перенаправления stdout"""
-        pass
+    def process_events(self):
+        """Разбор очереди событий в главном потоке: строки журнала вставляются
+        пачкой, прогресс и статус - только последнее значение"""
+        count = 0
+        try:
+            count = self.apply_events()
+        finally:
+            # Следующий разбор планируется при любой ошибке, иначе окно перестанет обновляться;
+            # если очередь не разобрана целиком, следующая пачка - сразу
+            self.root.after(1 if count >= EVENTS_BATCH else EVENTS_POLL_MS, self.process_events)
+
+    def apply_events(self):
+        """Применяет к окну одну пачку событий и возвращает их количество"""
+        events, progress, status = self.bus.drain(EVENTS_BATCH)
+        
+        chunk, chunk_level = [], None
+        for event in events:
+            if event[0] == 'log':
+                _, text, level = event
+                if len(text) > LOG_LINE_LIMIT:
+                    text = text[:LOG_LINE_LIMIT] + " ...[обрезано]"
+                if level != chunk_level and chunk:
+                    self.log_text.insert(tk.END, ''.join(chunk), chunk_level)
+                    chunk = []
+                chunk_level = level
+                chunk.append(text + "\n")
+            else:
+                if chunk:
+                    self.log_text.insert(tk.END, ''.join(chunk), chunk_level)
+                    chunk = []
+                _, func, args = event
+                try:
+                    func(*args)
+                except Exception as e:
+                    # stderr перенаправлен в шину: трассировка уходит в исходный поток ошибок
+                    traceback.print_exc(file=sys.__stderr__)
+                    name = getattr(func, '__name__', repr(func))
+                    self.log_message(f"Ошибка обработки события {name}: {type(e).__name__} {e}", "ERROR")
+        if chunk:
+            self.log_text.insert(tk.END, ''.join(chunk), chunk_level)
+        
+        if events:
+            # Кольцевой буфер: старые строки удаляются, виджет не растет бесконечно
+            lines = int(self.log_text.index('end-1c').split('.')[0])
+            if lines > LOG_MAX_LINES:
+                self.log_text.delete(1.0, f"{lines - LOG_MAX_LINES + 1}.0")
+            self.log_text.see(tk.END)
+        if progress is not None:
+            self.progress['value'] = progress
+        if status is not None:
+            self.show_status(status)
+        return len(events)
+
+    def toggle_log_file(self):
+        if self.log_file_var.get():
+            self.bus.open_log_file(DEFAULT_LOG_PATH)
+            self.log_message(f"Полный журнал пишется в файл: {os.path.abspath(DEFAULT_LOG_PATH)}", "INFO")
+        else:
+            self.bus.close_log_file()
 
     def change_theme(self, theme_name):
         self.current_theme = theme_name
@@ -208,7 +432,10 @@ class PDCheckerGUI:
 
     def select_file(self):
         self.input_file = filedialog.askopenfilename(
-            filetypes=[("Text files", "*.txt")],
+            filetypes=[("Файлы с ИНН", "*.txt *.csv *.xlsx"),
+                       ("Text files", "*.txt"),
+                       ("CSV files", "*.csv"),
+                       ("Excel files", "*.xlsx")],
             title="Выберите файл с ИНН"
         )
         if self.input_file:
@@ -221,19 +448,56 @@ class PDCheckerGUI:
             messagebox.showerror("Ошибка", "Сначала выберите файл!")
             return
             
-        self.is_running = True
-        self.results = []
-        
-        # Добавляем проверку успешности инициализации драйвера
-        self.driver = setup_driver()
-        if self.driver is None:
-            messagebox.showerror("Ошибка", 
-                "Не удалось инициализировать ChromeDriver.\n" +
-                "Проверьте:\n" +
-                "1. Установлен ли Google Chrome\n" +
-                "2. Обновите Chrome до последней версии\n" +
-                "3. Попробуйте запустить от имени администратора")
+        try:
+            workers = int(self.workers_var.get())
+        except ValueError:
+            messagebox.showerror("Ошибка", "Количество потоков должно быть числом!")
             return
+            
+        try:
+            # Общий лимит запросов к реестру для всех потоков
+            RATE_LIMITER.configure(float(self.rate_var.get().replace(',', '.')))
+        except ValueError:
+            messagebox.showerror("Ошибка", "Лимит запросов должен быть положительным числом!")
+            return
+            
+        # Журнал прошлой незавершенной проверки этого файла
+        journal = RunJournal(journal_path_for(self.input_file))
+        done = journal.load()
+        resume = False
+        if done:
+            answer = messagebox.askyesnocancel("Продолжить проверку?",
+                f"Найден журнал незавершенной проверки: {len(done)} ИНН уже проверено.\n" +
+                "Да - продолжить с места остановки\n" +
+                "Нет - начать проверку заново")
+            if answer is None:
+                return
+            resume = answer
+        self.done_results = done if resume else {}
+        self.journal = journal.open(resume)
+        self.input_column = self.column_var.get().strip() or None
+        
+        self.is_running = True
+        # Таблица и поисковый индекс заполняются в потоке проверки (run_check),
+        # чтобы окно не замирало на большом журнале
+        self.results = list(self.done_results.values())
+        
+        # Кэш открывается один раз и живет между запусками
+        if self.cache_var.get():
+            if self.cache is None:
+                self.cache = ResultCache()
+            self.cache.reset_stats()
+        cache = self.cache if self.cache_var.get() else None
+        
+        # Конвейер: потоки поиска и потоки карточек создают свои движки
+        engine_name = self.engine_var.get()
+        engine_options = {'driver_pool': self.driver_pool} if engine_name == 'selenium' else {}
+        self.pool = TwoStagePipeline(
+            lambda limiter: create_engine(engine_name, cache, rate_limiter=limiter, **engine_options),
+            search_workers=workers,
+            detail_workers=workers,
+            details=self.details_modes[self.details_var.get()],
+            on_result=self.on_check_result)
         
         self.start_btn.config(state=tk.DISABLED)
         self.stop_btn.config(state=tk.NORMAL)
@@ -245,52 +509,175 @@ class PDCheckerGUI:
     def run_check(self):
         try:
             self.clear_log()
+            METRICS.reset()
             self.log_message("Начало проверки...", "INFO")
             self.update_status("Выполняется проверка...")
             
-            with open(self.input_file, 'r') as f:
-                inn_list = [line.strip() for line in f if line.strip()]
-                
-            total = len(inn_list)
-            for i, inn in enumerate(inn_list):
-                if not self.is_running:
-                    self.log_message("Проверка остановлена пользователем", "WARNING")
-                    break
-                    
-                self.progress['value'] = (i + 1) / total * 100
-                self.log_message(f"Проверка ИНН {inn} ({i+1}/{total})", "INFO")
-                
-                try:
-                    result = check_operator_status(self.driver, inn)
-                    self.results.append({'inn': inn, 'data': result})
-                    if result:
-                        self.log_message(f"Найдено для ИНН {inn}", "SUCCESS")
-                    else:
-                        self.log_message(f"ИНН {inn} не найден в реестре", "WARNING")
-                except Exception as e:
-                    self.log_message(f"Ошибка при проверке ИНН {inn}: {str(e)}", "ERROR")
-                    
-            self.log_message("Проверка завершена", "SUCCESS")
-            self.update_status("Проверка завершена")
+            # Некорректные ИНН в реестр не отправляются, повторяющиеся проверяются один раз
+            records = self.records = read_inn_records(self.input_file, self.input_column)
+            inn_list = unique_inns(records)
+            invalid = [invalid_result(record) for record in records if record.error is not None]
+            pending = [inn for inn in inn_list if inn not in self.done_results]
+            self.total_count = len(inn_list) + len(invalid)
+            self.stats.reset(self.total_count)
+            self.stats.add_all(self.done_results[inn] for inn in inn_list if inn in self.done_results)
+            self.stats.add_all(invalid)
+            self.results.extend(invalid)
+            self.search_index.rebuild(self.results)
+            self.bus.call(self.results_view.set_rows, [result_values(result) for result in self.results])
+            self.bus.set_progress((self.total_count - len(pending)) / self.total_count * 100 if self.total_count else 0)
+            self.log_message(f"Загружено: {describe_records(records)}, потоков: {self.pool.workers}", "INFO")
+            for record in records:
+                if record.error is not None:
+                    self.log_message(f"Строка {record.row}: ИНН {record.raw} пропущен - {record.error}", "WARNING")
+            if self.done_results:
+                self.log_message(f"Продолжение по журналу: пропущено {len(inn_list) - len(pending)} ИНН", "INFO")
+            
+            new_results = self.pool.run(pending)
+            by_inn = dict(self.done_results)
+            by_inn.update((result['inn'], result) for result in new_results)
+            # Результаты в порядке строк исходного файла, повторы получают общий результат
+            self.results = fan_out(records, by_inn)
+            self.show_results()
+            
+            # ИНН, не проверенные из-за сбоев: список для отдельной повторной проверки
+            failed_path = failed_path_for(self.input_file)
+            failed = write_failed_list(failed_path, new_results)
+            if failed:
+                self.log_message(f"Не удалось проверить ИНН: {failed}. "
+                                 f"Для повторной проверки выберите файл {failed_path}", "ERROR")
+            
+            # Проверка завершена полностью - журнал больше не нужен
+            if all(inn in by_inn for inn in inn_list):
+                self.journal.remove()
+            
+            if self.is_running:
+                self.log_message("Проверка завершена", "SUCCESS")
+                self.update_status("Проверка завершена")
+            else:
+                self.log_message("Проверка остановлена пользователем", "WARNING")
+                self.update_status("Проверка остановлена")
+            if self.cache and self.cache_var.get():
+                self.log_message(self.cache.summary(), "INFO")
+            self.log_message("Замеры по этапам:\n" + METRICS.summary(), "INFO")
             
         except Exception as e:
             self.log_message(f"Критическая ошибка: {str(e)}", "ERROR")
             self.update_status("Произошла ошибка")
+            error_text = str(e)
+            self.bus.call(messagebox.showerror, "Ошибка", 
+                f"Не удалось выполнить проверку: {error_text}\n" +
+                "Проверьте:\n" +
+                "1. Установлен ли Google Chrome\n" +
+                "2. Обновите Chrome до последней версии\n" +
+                "3. Попробуйте запустить от имени администратора")
+        finally:
+            if self.pool:
+                self.pool.stop()
+            if self.journal:
+                self.journal.close()
+            self.stats.finish()
+            self.is_running = False
+            self.bus.call(self.stop_btn.config, {'state': tk.DISABLED})
+            self.bus.call(self.start_btn.config, {'state': tk.NORMAL})
+            self.bus.call(self.save_btn.config, {'state': tk.NORMAL})
+
+    def on_check_result(self, index, result, completed, total):
+        """Вызывается пулом по мере завершения каждого ИНН"""
+        self.journal.append(result)
+        self.results.append(result)
+        self.search_index.add(result)
+        self.stats.add(result)
+        self.bus.call(self.results_view.append, result_values(result))
+        completed += self.total_count - total
+        self.bus.set_progress(completed / self.total_count * 100)
+        stats = self.stats.snapshot()
+        eta = format_duration(stats['eta']) if stats['eta'] is not None else '-'
+        self.update_status(f"Проверено {completed}/{self.total_count}, "
+                           f"{stats['per_minute']:.1f} ИНН/мин, осталось ~{eta}")
+        if result['data']:
+            self.log_message(f"Найдено для ИНН {result['inn']} ({completed}/{self.total_count})", "SUCCESS")
+        elif result.get('status') == 'error':
+            self.log_message(f"ИНН {result['inn']} не проверен: {result['error']} "
+                             f"({completed}/{self.total_count})", "ERROR")
+        else:
+            self.log_message(f"ИНН {result['inn']} не найден в реестре ({completed}/{self.total_count})", "WARNING")
+
+    def show_results(self):
+        """Перезаполняет таблицу результатами в порядке входного файла (из любого потока)"""
+        rows = [result_values(result) for result in self.results]
+        self.bus.call(self.results_view.set_rows, rows)
+
+    def load_missing_details(self):
+        """Загружает карточки для найденных ИНН, проверенных без карточек"""
+        if not self.results or self.pool is None:
+            messagebox.showinfo("Информация", "Нет результатов проверки!")
+            return
+        if self.is_running:
+            messagebox.showinfo("Информация", "Дождитесь окончания проверки!")
+            return
+            
+        self.is_running = True
+        self.start_btn.config(state=tk.DISABLED)
+        self.details_btn.config(state=tk.DISABLED)
+        self.stop_btn.config(state=tk.NORMAL)
+        self.save_btn.config(state=tk.DISABLED)
+        
+        self.check_thread = threading.Thread(target=self.run_load_details)
+        self.check_thread.start()
+
+    def run_load_details(self):
+        try:
+            self.log_message("Загрузка карточек операторов...", "INFO")
+            self.update_status("Загрузка карточек...")
+            self.bus.set_progress(0)
+            self.pool.on_result = self.on_details_result
+            # Повторяющиеся ИНН: одна карточка на все строки файла
+            unique = {result['inn']: result for result in self.results if result.get('status') != 'invalid'}
+            fetched = self.pool.fetch_missing_details(list(unique.values()))
+            self.results = fan_out(self.records, {result['inn']: result for result in fetched})
+            # В карточках появились новые поля для поиска
+            self.search_index.rebuild(self.results)
+            self.show_results()
+            self.log_message("Загрузка карточек завершена", "SUCCESS")
+            self.update_status("Карточки загружены")
+        except Exception as e:
+            self.log_message(f"Ошибка при загрузке карточек: {str(e)}", "ERROR")
+            self.update_status("Произошла ошибка")
         finally:
-            if self.driver:
-                self.driver.quit()
-            self.stop_btn.config(state=tk.DISABLED)
-            self.start_btn.config(state=tk.NORMAL)
-            self.save_btn.config(state=tk.NORMAL)
+            self.pool.stop()
+            self.pool.on_result = self.on_check_result
+            self.is_running = False
+            self.bus.call(self.stop_btn.config, {'state': tk.DISABLED})
+            self.bus.call(self.start_btn.config, {'state': tk.NORMAL})
+            self.bus.call(self.details_btn.config, {'state': tk.NORMAL})
+            self.bus.call(self.save_btn.config, {'state': tk.NORMAL})
+
+    def on_details_result(self, index, result, completed, total):
+        """Вызывается конвейером по мере загрузки каждой карточки"""
+        self.bus.set_progress(completed / total * 100)
+        self.log_message(f"Карточка загружена для ИНН {result['inn']} ({completed}/{total})", "SUCCESS")
 
     def stop_check(self):
         self.is_running = False
-        if self.driver:
-            self.driver.quit()
+        if self.pool:
+            # Останавливаем все потоки и закрываем все драйверы пула
+            self.pool.stop()
         self.log_message("Остановка проверки...", "WARNING")
         self.stop_btn.config(state=tk.DISABLED)
         self.save_btn.config(state=tk.NORMAL)
 
+    def on_close(self):
+        """Закрытие окна: останавливаем проверку и завершаем прогретые браузеры"""
+        self.is_running = False
+        if self.pool:
+            self.pool.stop()
+        self.driver_pool.shutdown()
+        if self.cache:
+            self.cache.close()
+        self.bus.close_log_file()
+        self.root.destroy()
+
     def save_results(self):
         if not self.results:
             messagebox.showerror("Ошибка", "Нет данных для сохранения!")
@@ -318,7 +705,8 @@ class PDCheckerGUI:
         formats = {
             'excel': ('.xlsx', 'Excel files'),
             'csv': ('.csv', 'CSV files'),
-            'json': ('.json', 'JSON files')
+            'json': ('.json', 'JSON files'),
+            'parquet': ('.parquet', 'Parquet files')
         }
         
         ext, desc = formats[format_type]
@@ -337,112 +725,35 @@ class PDCheckerGUI:
                     df.to_csv(save_path, index=False, encoding='utf-8-sig')
                 elif format_type == 'json':
                     df.to_json(save_path, orient='records', force_ascii=False, indent=2)
+                elif format_type == 'parquet':
+                    # Parquet хранит типизированные исходные поля, а не столбцы таблицы
+                    store = ParquetResultStore(save_path)
+                    store.write_all(self.results)
+                    store.close()
                 self.log_message(f"Результаты сохранены в: {save_path}", "SUCCESS")
             except Exception as e:
                 messagebox.showerror("Ошибка", f"Ошибка при сохранении: {str(e)}")
 
     def create_dataframe(self):
-        data = []
-        for result in self.results:
-            inn = result['inn']  # Получаем ИНН из результата
-            status = "Найден" if result['data'] else "Не найден"  # Определяем статус
-            
-            if result['data']:
-                name_inn = result['data']['name_inn']
-                name = name_inn.split('ИНН:')[0].strip()
-                
-                data.append({
-                    'ИНН': inn,
-                    'Статус': status,
-                    'Наименование': name,
-                    'Тип оператора': result['data']['operator_type'],
-                    'Основание включения': result['data']['inclusion_basis'],
-                    'Дата регистрации': result['data']['registration_date'],
-                    'Дата начала обработки': result['data']['processing_start_date'],
-                    'Ответственный за ПД': result['data'].get('responsible_person', 'Не указан'),
-                    'Email': result['data'].get('email', ''),
-                    'Ссылка на карточку': result['data'].get('url', '')
-                })
-            else:
-                # Добавляем запись для ненайденного ИНН
-                data.append({
-                    'ИНН': inn,
-                    'Статус': status,
-                    'Наименование': '-',
-                    'Тип оператора': '-',
-                    'Основание включения': '-',
-                    'Дата регистрации': '-',
-                    'Дата начала обработки': '-',
-                    'Ответственный за ПД': '-',
-                    'Email': '-',
-                    'Ссылка на карточку': '-'
-                })
-        
-        # Обновляем порядок столбцов
-        columns = [
-            'ИНН',
-            'Статус',
-            'Наименование',
-            'Тип оператора',
-            'Основание включения',
-            'Дата регистрации',
-            'Дата начала обработки',
-            'Ответственный за ПД',
-            'Email',
-            'Ссылка на карточку'
-        ]
-        
-        return pd.DataFrame(data, columns=columns)
+        fill_details_from_cache(self.results, self.cache)
+        data = [result_row(result) for result in self.results]
+        return pd.DataFrame(data, columns=RESULT_COLUMNS)
 
     def save_excel_report(self, df, filename):
-        with pd.ExcelWriter(filename, engine='openpyxl') as writer:
-            df.to_excel(writer, index=False, sheet_name='Операторы')
-            
-            worksheet = writer.sheets['Операторы']
-            
-            # Добавляем условное форматирование для столбца "Статус"
-            status_column = 'B'  # Столбец B для "Статус"
-            for row in range(2, len(df) + 2):  # +2 так как Excel начинается с 1 и есть заголовок
-                cell = f"{status_column}{row}"
-                if worksheet[cell].value == "Найден":
-                    worksheet[cell].fill = PatternFill(start_color="90EE90", end_color="90EE90", fill_type="solid")
-                else:
-                    worksheet[cell].fill = PatternFill(start_color="FFB6C1", end_color="FFB6C1", fill_type="solid")
-            
-            # Настраиваем ширину столбцов
-            for column in worksheet.columns:
-                max_length = 0
-                column = [cell for cell in column]
-                for cell in column:
-                    try:
-                        if len(str(cell.value)) > max_length:
-                            max_length = len(str(cell.value))
-                    except:
-                        pass
-                adjusted_width = (max_length + 2)
-                worksheet.column_dimensions[column[0].column_letter].width = adjusted_width
-            
-            # Добавляем фильтр
-            worksheet.auto_filter.ref = worksheet.dimensions
+        # Общая с pd_checker потоковая запись: стили, ширина столбцов,
+        # условное форматирование столбца "Статус" и фильтр
+        write_excel_report(df, filename, status_column='Статус')
 
     def log_message(self, message, level="INFO"):
-        """Логирование с уровнями и цветами"""
-        timestamp = datetime.datetime.now().strftime("%H:%M:%S")
-        
-        colors = {
-            "INFO": "white",
-            "ERROR": "red",
-            "SUCCESS": "green",
-            "WARNING": "yellow"
-        }
-        
-        self.log_text.tag_config(level, foreground=colors[level])
-        self.log_text.insert(tk.END, f"[{timestamp}] {message}\n", level)
-        self.log_text.see(tk.END)
-        self.root.update_idletasks()
+        """Логирование с уровнями и цветами (из любого потока)"""
+        self.bus.log(message, level)
         
     def update_status(self, message):
-        """Обновление статус бара с возможностью копирования"""
+        """Обновление статус бара (из любого потока)"""
+        self.bus.set_status(message)
+        
+    def show_status(self, message):
+        """Статус бар с возможностью копирования"""
         self.status_text.configure(state='normal')
         self.status_text.delete(1.0, tk.END)
         self.status_text.insert(tk.END, message)
@@ -450,7 +761,7 @@ class PDCheckerGUI:
         
     def clear_log(self):
         """Очистка лога"""
-        self.log_text.delete(1.0, tk.END)
+        self.bus.call(self.log_text.delete, 1.0, tk.END)
 
     def search_results(self):
         if not self.results:
@@ -459,68 +770,96 @@ class PDCheckerGUI:
             
         search_window = tk.Toplevel(self.root)
         search_window.title("Поиск по результатам")
-        search_window.geometry("400x300")
+        search_window.geometry("800x400")
         
-        ttk.Label(search_window, text="Введите текст для поиска:").pack(pady=5)
-        search_entry = ttk.Entry(search_window, width=40)
+        ttk.Label(search_window, text="Введите текст для поиска (ИНН, рег. номер, наименование, email...):").pack(pady=5)
+        query_var = tk.StringVar()
+        search_entry = ttk.Entry(search_window, width=60, textvariable=query_var)
         search_entry.pack(pady=5)
+        search_entry.focus_set()
         
-        results_text = tk.Text(search_window, height=15, width=45)
-        results_text.pack(pady=5)
+        found_label = ttk.Label(search_window, text="")
+        found_label.pack()
+        
+        results_view = ResultsView(search_window, RESULT_COLUMNS, RESULT_COLUMN_WIDTHS)
+        results_view.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        
+        pending = [None]
         
         def perform_search():
-            query = search_entry.get().lower()
-            results_text.delete(1.0, tk.END)
-            
-            found = False
-            df = self.create_dataframe()
-            for _, row in df.iterrows():
-                if any(query in str(value).lower() for value in row):
-                    results_text.insert(tk.END, f"ИНН: {row['ИНН']}\n")
-                    results_text.insert(tk.END, f"Наименование: {row['Наименование']}\n")
-                    results_text.insert(tk.END, "-" * 40 + "\n")
-                    found = True
-                    
-            if not found:
-                results_text.insert(tk.END, "Ничего не найдено")
-        
-        ttk.Button(search_window, text="Найти", command=perform_search).pack(pady=5)
+            pending[0] = None
+            found = self.search_index.search(query_var.get(), SEARCH_LIMIT)
+            results_view.set_rows([result_values(result) for result in found])
+            query = query_var.get().strip()
+            if not query:
+                found_label.configure(text="")
+            elif not found and len(query) < MIN_QUERY_LENGTH:
+                found_label.configure(text=f"Введите не меньше {MIN_QUERY_LENGTH} символов")
+            elif not found:
+                found_label.configure(text="Ничего не найдено")
+            elif len(found) >= SEARCH_LIMIT:
+                found_label.configure(text=f"Показаны первые {SEARCH_LIMIT} совпадений")
+            else:
+                found_label.configure(text=f"Найдено: {len(found)}")
+        
+        def on_query_change(*args):
+            # Поиск при вводе: запрос выполняется после паузы в наборе
+            if pending[0] is not None:
+                search_window.after_cancel(pending[0])
+            pending[0] = search_window.after(150, perform_search)
+        
+        query_var.trace_add('write', on_query_change)
+        search_entry.bind('<Return>', lambda e: perform_search())
+
+    def show_metrics(self):
+        """Время по этапам проверки и экспорт метрик в JSON / Prometheus"""
+        metrics_window = tk.Toplevel(self.root)
+        metrics_window.title("Метрики")
+        metrics_window.geometry("700x400")
+        
+        metrics_text = tk.Text(metrics_window, height=20, width=90, font=('Consolas', 9))
+        metrics_text.pack(fill=tk.BOTH, expand=True, pady=5)
+        metrics_text.insert(tk.END, METRICS.summary())
+        metrics_text.configure(state='disabled')
+        
+        def export():
+            path = filedialog.asksaveasfilename(
+                defaultextension=".json",
+                filetypes=[("JSON", "*.json"), ("Prometheus", "*.prom")],
+                title="Сохранить метрики"
+            )
+            if path:
+                try:
+                    METRICS.export(path)
+                    self.log_message(f"Метрики сохранены в: {path}", "SUCCESS")
+                except Exception as e:
+                    messagebox.showerror("Ошибка", f"Ошибка при сохранении: {str(e)}")
+        
+        ttk.Button(metrics_window, text="Сохранить", command=export).pack(pady=5)
 
     def show_statistics(self):
         if not self.results:
             messagebox.showinfo("Информация", "Нет данных для анализа!")
             return
             
-        df = self.create_dataframe()
-        
         stats_window = tk.Toplevel(self.root)
         stats_window.title("Статистика")
-        stats_window.geometry("400x300")
-        
-        stats_text = tk.Text(stats_window, height=15, width=45)
-        stats_text.pack(pady=5)
-        
-        total = len(df)
-        found = len(df[df['Статус'] == 'Найден'])
-        not_found = len(df[df['Статус'] == 'Не найден'])
-        
-        stats = (
-            f"Общая статистика:\n"
-            f"{'='*40}\n"
-            f"Всего проверено: {total}\n"
-            f"Найдено: {found} ({found/total*100:.1f}%)\n"
-            f"Не найдено: {not_found} ({not_found/total*100:.1f}%)\n"
-            f"\nТоп операторов по типу:\n"
-            f"{'='*40}\n"
-        )
-        
-        if found > 0:
-            type_stats = df[df['Статус'] == 'Найден']['Тип оператора'].value_counts()
-            for type_name, count in type_stats.items():
-                stats += f"{type_name}: {count}\n"
-        
-        stats_text.insert(tk.END, stats)
-        stats_text.configure(state='disabled')
+        stats_window.geometry("400x450")
+        
+        stats_text = tk.Text(stats_window, height=25, width=45)
+        stats_text.pack(fill=tk.BOTH, expand=True, pady=5)
+        
+        def refresh():
+            # Окно обновляется раз в секунду из накопленных счетчиков
+            if not stats_window.winfo_exists():
+                return
+            stats_text.configure(state='normal')
+            stats_text.delete(1.0, tk.END)
+            stats_text.insert(tk.END, format_stats(self.stats.snapshot()))
+            stats_text.configure(state='disabled')
+            self.root.after(1000, refresh)
+        
+        refresh()
 
 if __name__ == "__main__":
     root = tk.Tk()
@@ -0,0 +1,125 @@
+"""Проверка операторов через HTTP-запросы без браузера"""
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from registry_parser import (
+    OPERATORS_LIST_URL,
+    parse_search_form,
+    parse_search_results,
+    parse_operator_details
+)
+from rate_limiter import RATE_LIMITER, THROTTLE_STATUS_CODES, parse_retry_after
+from metrics import METRICS
+from retry_policy import TransientError
+
+USER_AGENT = ('Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+              '(KHTML, like Gecko) Chrome/120.0 Safari/537.36')
+
+
+class HttpEngine:
+    """Движок на requests + BeautifulSoup: одна keep-alive сессия с пулом соединений"""
+    name = 'http'
+
+    def __init__(self, base_url=OPERATORS_LIST_URL, timeout=15, pool_size=10,
+                 rate_limiter=RATE_LIMITER):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter
+        self.closed = threading.Event()
+        self.session = requests.Session()
+        self.session.headers.update({
+            'User-Agent': USER_AGENT,
+            'Accept-Language': 'ru-RU,ru;q=0.9'
+        })
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.search_form = None
+
+    def fetch(self, url, method='get', **kwargs):
+        """Загружает страницу и возвращает ответ с корректной кодировкой"""
+        if not self.rate_limiter.acquire(self.closed):
+            raise RuntimeError("Движок остановлен")
+        try:
+            response = self.session.request(method, url, timeout=self.timeout, **kwargs)
+        except requests.Timeout:
+            self.rate_limiter.report_throttle("таймаут")
+            raise
+        if response.status_code in THROTTLE_STATUS_CODES:
+            self.rate_limiter.report_throttle(
+                f"HTTP {response.status_code}",
+                parse_retry_after(response.headers.get('Retry-After'))
+            )
+        else:
+            self.rate_limiter.report_success()
+        response.raise_for_status()
+        METRICS.increment('http.bytes', len(response.content))
+        if not response.encoding or response.encoding.lower() == 'iso-8859-1':
+            response.encoding = response.apparent_encoding
+        return response
+
+    def get_search_form(self):
+        """Описание формы поиска читается с сайта один раз на сессию"""
+        if self.search_form is None:
+            with METRICS.timer('search.open_page'):
+                response = self.fetch(self.base_url)
+            self.search_form = parse_search_form(response.text, response.url)
+            if self.search_form is None:
+                raise RuntimeError("Форма поиска не найдена на странице реестра")
+        return self.search_form
+
+    def search(self, inn):
+        """Первый этап: поиск по ИНН в списке операторов.
+
+        None - ИНН нет в реестре; сбой запроса или разбора - TransientError.
+        """
+        try:
+            form = self.get_search_form()
+            fields = dict(form['fields'])
+            fields['inn'] = inn
+            print(f"Запрос реестра для ИНН: {inn}")
+            with METRICS.timer('search.submit'):
+                if form['method'] == 'post':
+                    response = self.fetch(form['action'], 'post', data=fields)
+                else:
+                    response = self.fetch(form['action'], params=fields)
+
+            with METRICS.timer('search.parse'):
+                result = parse_search_results(response.text, response.url)
+            if result is None:
+                print(f"Для ИНН {inn} нет данных в таблице")
+            return result
+
+        except Exception as e:
+            # Сюда же попадает ResultsPageError: капча или страница ошибки вместо результатов
+            METRICS.increment('search.errors')
+            # Форма могла смениться вместе с ошибкой - при повторе читается заново
+            self.search_form = None
+            raise TransientError(f"ошибка поиска: {e}") from e
+
+    def fetch_details(self, inn, result):
+        """Второй этап: ответственное лицо и контакты из карточки оператора"""
+        # Без ссылки на карточку повтор не поможет - остается результат поиска
+        if not result.get('url'):
+            METRICS.increment('details.no_url')
+            print(f"Ссылка на карточку оператора {result.get('reg_number', '')} не найдена")
+            return result
+        try:
+            print(f"Загрузка карточки: {result['url']}")
+            with METRICS.timer('details.open_page'):
+                detail = self.fetch(result['url'])
+            with METRICS.timer('details.parse'):
+                result.update(parse_operator_details(detail.text))
+            print(f"Email получен: {result['email']}")
+        except Exception as e:
+            METRICS.increment('details.errors')
+            raise TransientError(f"ошибка загрузки карточки: {e}") from e
+        return result
+
+    def check(self, inn):
+        result = self.search(inn)
+        return self.fetch_details(inn, result) if result else None
+
+    def close(self):
+        self.closed.set()
+        self.session.close()
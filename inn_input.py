@@ -0,0 +1,198 @@
+"""Чтение списка ИНН из TXT/CSV/XLSX с проверкой контрольных цифр и удалением дублей"""
+import csv
+import re
+from collections import namedtuple
+
+# Строка входного файла: номер строки, исходное значение, нормализованный ИНН, ошибка
+InnRecord = namedtuple('InnRecord', ['row', 'raw', 'inn', 'error'])
+
+# Весовые коэффициенты контрольных цифр ИНН
+WEIGHTS_10 = (2, 4, 10, 3, 5, 9, 4, 6, 8)
+WEIGHTS_12_FIRST = (7, 2, 4, 10, 3, 5, 9, 4, 6, 8)
+WEIGHTS_12_SECOND = (3, 7, 2, 4, 10, 3, 5, 9, 4, 6, 8)
+
+# Заголовок столбца с ИНН при автоматическом выборе
+INN_HEADER = re.compile(r'инн|inn', re.IGNORECASE)
+SEPARATORS = re.compile(r'[\s \-]+')
+
+
+def control_digit(digits, weights):
+    return sum(int(digit) * weight for digit, weight in zip(digits, weights)) % 11 % 10
+
+
+def inn_checksum_valid(inn):
+    """Проверка контрольных цифр 10-значного (организация) или 12-значного (физлицо, ИП) ИНН"""
+    if len(inn) == 10:
+        return control_digit(inn, WEIGHTS_10) == int(inn[9])
+    if len(inn) == 12:
+        return (control_digit(inn, WEIGHTS_12_FIRST) == int(inn[10]) and
+                control_digit(inn, WEIGHTS_12_SECOND) == int(inn[11]))
+    return False
+
+
+def normalize_inn(value):
+    """Нормализованный ИНН и текст ошибки (None, если ИНН корректен).
+
+    Убираются пробелы и дефисы, хвост ".0" от числовой ячейки Excel;
+    потерянные Excel ведущие нули восстанавливаются (9 -> 10, 11 -> 12 цифр).
+    """
+    if value is None:
+        return '', "пустое значение"
+    text = SEPARATORS.sub('', str(value))
+    if text.endswith('.0'):
+        text = text[:-2]
+    if not text:
+        return '', "пустое значение"
+    if not text.isdigit():
+        return text, "ИНН должен состоять из цифр"
+    if len(text) in (9, 11):
+        text = '0' + text
+    if len(text) not in (10, 12):
+        return text, f"ИНН должен содержать 10 или 12 цифр, а не {len(text)}"
+    if not inn_checksum_valid(text):
+        return text, "неверные контрольные цифры"
+    return text, None
+
+
+def looks_like_header(value):
+    """Ячейка без единой цифры считается заголовком, а не ИНН"""
+    return not any(char.isdigit() for char in str(value or ''))
+
+
+def select_column(header, column):
+    """Индекс столбца и признак строки заголовка.
+
+    column - номер столбца (с 1), имя заголовка или None: тогда берется
+    столбец, в заголовке которого есть "ИНН", иначе первый.
+    """
+    names = [str(name or '').strip() for name in header]
+    if column is not None and str(column).strip().isdigit():
+        idx = int(column) - 1
+        return idx, idx < len(names) and looks_like_header(names[idx])
+    if column:
+        for idx, name in enumerate(names):
+            if name.lower() == str(column).strip().lower():
+                return idx, True
+        raise ValueError(f"Столбец {column} не найден. Есть столбцы: {', '.join(names)}")
+    for idx, name in enumerate(names):
+        if INN_HEADER.search(name) and looks_like_header(name):
+            return idx, True
+    return 0, bool(names) and looks_like_header(names[0])
+
+
+def iter_table_values(rows, column=None):
+    """(номер строки, значение) выбранного столбца из итератора строк таблицы"""
+    rows = iter(rows)
+    first = next(rows, None)
+    if first is None:
+        return
+    idx, has_header = select_column(first, column)
+    if not has_header:
+        yield 1, first[idx] if idx < len(first) else None
+    for number, row in enumerate(rows, start=2):
+        if not row or all(value in (None, '') for value in row):
+            continue
+        yield number, row[idx] if idx < len(row) else None
+
+
+def iter_line_values(lines):
+    """(номер строки, значение) из текста по одному ИНН на строку; пустые строки пропускаются"""
+    for number, line in enumerate(lines, start=1):
+        if line.strip():
+            yield number, line.strip()
+
+
+def iter_txt_values(path, encoding='utf-8-sig'):
+    with open(path, 'r', encoding=encoding) as f:
+        yield from iter_line_values(f)
+
+
+def iter_csv_values(path, column=None, encoding='utf-8-sig'):
+    with open(path, 'r', encoding=encoding, newline='') as f:
+        sample = f.read(64 * 1024)
+        f.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=';,\t|')
+        except csv.Error:
+            dialect = csv.excel
+        yield from iter_table_values(csv.reader(f, dialect), column)
+
+
+def iter_xlsx_values(path, column=None, sheet=None):
+    from openpyxl import load_workbook
+    # read_only: строки читаются из файла по мере обхода, книга целиком в память не грузится
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        worksheet = workbook[sheet] if sheet else workbook.active
+        yield from iter_table_values(worksheet.iter_rows(values_only=True), column)
+    finally:
+        workbook.close()
+
+
+def iter_input_values(path, column=None, sheet=None):
+    """Потоковое чтение значений столбца с ИНН; формат - по расширению файла"""
+    lower = path.lower()
+    if lower.endswith(('.xlsx', '.xlsm')):
+        return iter_xlsx_values(path, column, sheet)
+    if lower.endswith('.csv'):
+        return iter_csv_values(path, column)
+    return iter_txt_values(path)
+
+
+def open_input_values(path, column=None, sheet=None):
+    """То же, что iter_input_values, но файл открывается и столбец выбирается сразу.
+
+    Нет файла, листа или столбца - исключение здесь, до начала проверки,
+    а не при первом чтении в потоке конвейера.
+    """
+    values = iter_input_values(path, column, sheet)
+    first = next(values, None)
+    return continue_values(first, values)
+
+
+def continue_values(first, values):
+    if first is None:
+        return
+    yield first
+    yield from values
+
+
+def iter_inn_records(values):
+    for row, raw in values:
+        inn, error = normalize_inn(raw)
+        yield InnRecord(row, '' if raw is None else str(raw).strip(), inn, error)
+
+
+def read_inn_records(path, column=None, sheet=None):
+    """Все строки входного файла с результатом проверки ИНН"""
+    return list(iter_inn_records(iter_input_values(path, column, sheet)))
+
+
+def unique_inns(records):
+    """Корректные ИНН без повторов в порядке первого появления"""
+    return list(dict.fromkeys(record.inn for record in records if record.error is None))
+
+
+def invalid_result(record):
+    """Результат для некорректного ИНН: в отчет без обращения к реестру"""
+    return {'inn': record.raw or record.inn, 'data': None, 'status': 'invalid', 'error': record.error}
+
+
+def fan_out(records, results_by_inn):
+    """Результаты по строкам входного файла: повторяющиеся ИНН получают общий результат"""
+    results = []
+    for record in records:
+        if record.error is not None:
+            results.append(invalid_result(record))
+        elif record.inn in results_by_inn:
+            results.append(results_by_inn[record.inn])
+    return results
+
+
+def describe_records(records):
+    """Краткая сводка: строк, уникальных ИНН, повторов, некорректных"""
+    invalid = sum(1 for record in records if record.error is not None)
+    unique = len(unique_inns(records))
+    duplicates = len(records) - invalid - unique
+    return (f"строк: {len(records)}, уникальных ИНН: {unique}, "
+            f"повторов: {duplicates}, некорректных: {invalid}")
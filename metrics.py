@@ -0,0 +1,155 @@
+"""Замеры времени по этапам проверки: таймеры, счетчики и гистограммы"""
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+# Верхние границы корзин гистограмм, секунды
+BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, float('inf'))
+
+PROMETHEUS_PREFIX = 'pd_checker'
+
+
+class Histogram:
+    """Количество, сумма, минимум, максимум и корзины по BUCKETS"""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        for idx, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[idx] += 1
+                break
+
+    def quantile(self, q):
+        """Оценка квантиля по корзинам (линейно внутри корзины)"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        lower = 0.0
+        for bound, count in zip(self.buckets, self.counts):
+            if count and seen + count >= rank:
+                upper = bound if bound != float('inf') else self.max
+                return min(self.max, lower + (upper - lower) * (rank - seen) / count)
+            seen += count
+            lower = bound
+        return self.max
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'sum': round(self.sum, 6),
+            'min': self.min,
+            'max': self.max,
+            'avg': self.sum / self.count if self.count else None,
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'buckets': {('+Inf' if bound == float('inf') else str(bound)): count
+                        for bound, count in zip(self.buckets, self.counts)}
+        }
+
+
+class Metrics:
+    """Потокобезопасный набор метрик одного запуска.
+
+    Этапы замеряются через with METRICS.timer('search.open_page'): ...,
+    события считаются через METRICS.increment('search.found').
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.histograms = {}
+            self.counters = {}
+            self.started_at = time.time()
+
+    def observe(self, name, seconds):
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(seconds)
+
+    def increment(self, name, value=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    @contextmanager
+    def timer(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'started_at': self.started_at,
+                'duration': time.time() - self.started_at,
+                'timers': {name: histogram.to_dict() for name, histogram in sorted(self.histograms.items())},
+                'counters': dict(sorted(self.counters.items()))
+            }
+
+    def summary(self):
+        """Таблица для вывода в консоль и окно метрик"""
+        snapshot = self.snapshot()
+        lines = [f"{'Этап':<28} {'раз':>7} {'всего, с':>10} {'сред, с':>9} {'p95, с':>8} {'макс, с':>8}"]
+        for name, timer in snapshot['timers'].items():
+            lines.append(f"{name:<28} {timer['count']:>7} {timer['sum']:>10.2f} {timer['avg']:>9.3f} "
+                         f"{timer['p95']:>8.3f} {timer['max']:>8.3f}")
+        if snapshot['counters']:
+            lines.append("")
+            lines.append("Счетчики:")
+            for name, value in snapshot['counters'].items():
+                lines.append(f"  {name}: {value}")
+        return '\n'.join(lines)
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), ensure_ascii=False, indent=2)
+
+    def to_prometheus(self, prefix=PROMETHEUS_PREFIX):
+        """Текстовый формат Prometheus (для node_exporter textfile / pushgateway)"""
+        snapshot = self.snapshot()
+        lines = [
+            f"# HELP {prefix}_phase_seconds Длительность этапов проверки",
+            f"# TYPE {prefix}_phase_seconds histogram"
+        ]
+        for name, timer in snapshot['timers'].items():
+            cumulative = 0
+            for bound, count in timer['buckets'].items():
+                cumulative += count
+                lines.append(f'{prefix}_phase_seconds_bucket{{phase="{name}",le="{bound}"}} {cumulative}')
+            lines.append(f'{prefix}_phase_seconds_sum{{phase="{name}"}} {timer["sum"]}')
+            lines.append(f'{prefix}_phase_seconds_count{{phase="{name}"}} {timer["count"]}')
+        lines += [
+            f"# HELP {prefix}_events_total Счетчики событий проверки",
+            f"# TYPE {prefix}_events_total counter"
+        ]
+        for name, value in snapshot['counters'].items():
+            lines.append(f'{prefix}_events_total{{event="{name}"}} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def export(self, path):
+        """Сохраняет метрики: *.prom - формат Prometheus, иначе JSON"""
+        text = self.to_prometheus() if path.endswith('.prom') else self.to_json()
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+
+
+# Общие метрики процесса
+METRICS = Metrics()
@@ -0,0 +1,113 @@
+"""Колоночное хранилище результатов в формате Parquet"""
+import datetime
+import os
+import threading
+import pyarrow as pa
+import pyarrow.parquet as pq
+from reports import split_name_inn, result_status
+
+# Типизированная схема: даты - date32, ИНН оператора отделен от наименования
+SCHEMA = pa.schema([
+    ('inn', pa.string()),
+    ('status', pa.string()),
+    ('reg_number', pa.string()),
+    ('name', pa.string()),
+    ('operator_inn', pa.string()),
+    ('operator_type', pa.string()),
+    ('inclusion_basis', pa.string()),
+    ('registration_date', pa.date32()),
+    ('processing_start_date', pa.date32()),
+    ('responsible_person', pa.string()),
+    ('contact_details', pa.string()),
+    ('email', pa.string()),
+    ('url', pa.string()),
+    ('checked_at', pa.timestamp('s'))
+])
+
+
+def parse_date(value):
+    """Дата реестра в формате ДД.ММ.ГГГГ или None"""
+    try:
+        return datetime.datetime.strptime(value.strip(), '%d.%m.%Y').date()
+    except (AttributeError, ValueError):
+        return None
+
+
+def result_to_record(result, checked_at=None):
+    """Плоская запись по схеме SCHEMA из результата проверки"""
+    data = result['data'] or {}
+    name, operator_inn = split_name_inn(data['name_inn']) if data.get('name_inn') else (None, None)
+    return {
+        'inn': result['inn'],
+        'status': result_status(result),
+        'reg_number': data.get('reg_number'),
+        'name': name,
+        'operator_inn': operator_inn or None,
+        'operator_type': data.get('operator_type'),
+        'inclusion_basis': data.get('inclusion_basis'),
+        'registration_date': parse_date(data.get('registration_date')),
+        'processing_start_date': parse_date(data.get('processing_start_date')),
+        'responsible_person': data.get('responsible_person'),
+        'contact_details': data.get('contact_details'),
+        'email': data.get('email'),
+        'url': data.get('url'),
+        'checked_at': checked_at or datetime.datetime.now().replace(microsecond=0)
+    }
+
+
+class ParquetResultStore:
+    """Запись результатов в Parquet группами строк по мере проверки.
+
+    При partition_by_date path - корень набора данных, файл кладется в
+    подкаталог run_date=ГГГГ-ММ-ДД (разбиение в стиле Hive), так что
+    ежемесячные срезы читаются одним набором с отбором по дате и столбцам.
+    """
+
+    def __init__(self, path, row_group_size=1000, partition_by_date=False):
+        self.row_group_size = row_group_size
+        self.lock = threading.Lock()
+        self.buffer = []
+        self.count = 0
+        self.started_at = datetime.datetime.now().replace(microsecond=0)
+
+        if partition_by_date:
+            partition = os.path.join(path, f"run_date={self.started_at.date().isoformat()}")
+            os.makedirs(partition, exist_ok=True)
+            self.path = os.path.join(partition, f"part-{self.started_at:%H%M%S}.parquet")
+        else:
+            self.path = path
+        self.writer = pq.ParquetWriter(self.path, SCHEMA, compression='zstd')
+
+    def write(self, result):
+        with self.lock:
+            self.buffer.append(result_to_record(result))
+            if len(self.buffer) >= self.row_group_size:
+                self.flush_locked()
+
+    def write_all(self, results):
+        for result in results:
+            self.write(result)
+
+    def flush(self):
+        with self.lock:
+            self.flush_locked()
+
+    def flush_locked(self):
+        if not self.buffer or self.writer is None:
+            return
+        table = pa.Table.from_pylist(self.buffer, schema=SCHEMA)
+        self.writer.write_table(table)
+        self.count += len(self.buffer)
+        self.buffer = []
+
+    def close(self):
+        with self.lock:
+            self.flush_locked()
+            if self.writer is not None:
+                self.writer.close()
+                self.writer = None
+
+
+def read_results(path, columns=None, filters=None):
+    """Читает файл или разбитый по датам набор с отбором столбцов и строк"""
+    return pq.read_table(path, columns=columns, filters=filters, partitioning='hive')
@@ -5,13 +5,35 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
+from selenium.common.exceptions import TimeoutException
 from webdriver_manager.chrome import ChromeDriverManager
-import xml.etree.ElementTree as ET
-from xml.dom import minidom
 import pandas as pd
+import json
 import os
+import re
+import subprocess
 import sys
-from openpyxl.styles import PatternFill, Font, Alignment, Border, Side
+import threading
+from collections import Counter
+from registry_parser import (
+    OPERATORS_LIST_URL,
+    RESPONSIBLE_LABEL,
+    extract_email,
+    parse_search_results,
+    parse_operator_details
+)
+from http_engine import HttpEngine
+from registry_index import IndexEngine
+from worker_pool import TwoStagePipeline, DETAILS_ALL, DETAILS_NONE
+from rate_limiter import RATE_LIMITER, RateLimiter
+from result_cache import ResultCache, CachedEngine, fill_details_from_cache
+from run_journal import RunJournal, journal_path_for, failed_path_for, write_failed_list
+from reports import XmlReportWriter, split_name_inn, write_excel_report, status_label
+from inn_input import read_inn_records, unique_inns, fan_out, invalid_result, describe_records
+from parquet_store import ParquetResultStore
+from metrics import METRICS
+from retry_policy import TransientError, RetryPolicy
+from snapshot_diff import load_snapshot, SnapshotEngine, diff_results, describe_changes, write_changes_report
 
 def read_inn_list(filename):
     with open(filename, 'r') as file:
@@ -39,7 +61,125 @@ def verify_chrome_installation():
     except Exception as e:
         return {'error': str(e)}
 
-def setup_driver():
+# Путь к chromedriver, заданный вручную: используется без обращения к сети
+CHROMEDRIVER_PATH_ENV = 'CHROMEDRIVER_PATH'
+# Найденный путь к драйверу запоминается вместе с версией браузера
+DRIVER_CACHE_PATH = os.path.join(os.path.expanduser('~'), '.pd_checker_driver.json')
+DRIVER_BINARY = 'chromedriver.exe' if sys.platform == 'win32' else 'chromedriver'
+BROWSER_COMMANDS = [
+    'google-chrome',
+    'google-chrome-stable',
+    'chromium',
+    'chromium-browser',
+    '/Applications/Google Chrome.app/Contents/MacOS/Google Chrome'
+]
+
+def detect_browser_version():
+    """Версия установленного Chrome без обращения к сети или None"""
+    if sys.platform == 'win32':
+        return verify_chrome_installation().get('version')
+    for command in BROWSER_COMMANDS:
+        try:
+            output = subprocess.run([command, '--version'], capture_output=True,
+                                    text=True, timeout=5).stdout
+        except (OSError, subprocess.SubprocessError):
+            continue
+        match = re.search(r'\d+(\.\d+)+', output)
+        if match:
+            return match.group(0)
+    return None
+
+def find_driver_binary(path):
+    """webdriver_manager может вернуть путь к соседнему файлу (например, THIRD_PARTY_NOTICES),
+    поэтому исполняемый файл драйвера ищется в той же папке"""
+    if os.path.basename(path) == DRIVER_BINARY:
+        return path
+    driver_dir = os.path.dirname(path)
+    for file in os.listdir(driver_dir):
+        if file == DRIVER_BINARY:
+            return os.path.join(driver_dir, file)
+    return path
+
+def resolve_driver_path(cache_path=DRIVER_CACHE_PATH):
+    """Путь к chromedriver: переменная окружения, затем кэш, затем webdriver_manager"""
+    env_path = os.environ.get(CHROMEDRIVER_PATH_ENV)
+    if env_path:
+        if not os.path.exists(env_path):
+            raise FileNotFoundError(f"{CHROMEDRIVER_PATH_ENV} указывает на несуществующий файл: {env_path}")
+        return env_path
+    
+    browser_version = detect_browser_version()
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+        # Драйвер из кэша годится, пока файл на месте и браузер не обновился
+        if os.path.exists(cached['driver_path']) and cached.get('browser_version') == browser_version:
+            return cached['driver_path']
+    except (OSError, ValueError, KeyError):
+        pass
+    
+    with METRICS.timer('driver.install'):
+        driver_path = find_driver_binary(ChromeDriverManager().install())
+    try:
+        with open(cache_path, 'w', encoding='utf-8') as f:
+            json.dump({'driver_path': driver_path, 'browser_version': browser_version}, f)
+    except OSError as e:
+        print(f"Не удалось сохранить путь к ChromeDriver: {str(e)}")
+    return driver_path
+
+# Облегченный режим браузера: страницы реестра без картинок, шрифтов, стилей и счетчиков
+LEAN_BROWSING = True
+
+# Для разбора нужен только DOM: eager не ждет загрузки картинок и стилей
+LEAN_PAGE_LOAD_STRATEGY = 'eager'
+
+LEAN_ARGUMENTS = [
+    '--disable-extensions',
+    '--disable-background-networking',
+    '--disable-component-update',
+    '--disable-default-apps',
+    '--disable-sync',
+    '--no-first-run',
+    '--mute-audio',
+    '--blink-settings=imagesEnabled=false'
+]
+
+LEAN_PREFS = {
+    'profile.managed_default_content_settings.images': 2,
+    'profile.default_content_setting_values.notifications': 2
+}
+
+# Запросы, которые браузер не выполняет (CDP Network.setBlockedURLs)
+BLOCKED_URLS = [
+    '*.png', '*.jpg', '*.jpeg', '*.gif', '*.svg', '*.webp', '*.ico',
+    '*.woff', '*.woff2', '*.ttf', '*.otf', '*.eot',
+    '*.css',
+    '*google-analytics.com*', '*googletagmanager.com*', '*doubleclick.net*',
+    '*mc.yandex.ru*', '*top-fwz1.mail.ru*', '*counter.yadro.ru*', '*sputnik.ru*'
+]
+
+# Замер трафика браузера - лишнее обращение к WebDriver на каждую страницу,
+# поэтому включается только для замеров (benchmarks/run_benchmark.py)
+MEASURE_PAGE_TRANSFER = False
+
+# Объем, переданный по сети для текущей страницы и ее ресурсов (Performance API)
+TRANSFER_SIZE_SCRIPT = """
+return performance.getEntriesByType('navigation')
+    .concat(performance.getEntriesByType('resource'))
+    .reduce((total, entry) => total + (entry.transferSize || 0), 0);
+"""
+
+def record_page_transfer(driver):
+    """Учитывает в метриках байты, загруженные браузером для открытой страницы"""
+    if not MEASURE_PAGE_TRANSFER:
+        return
+    try:
+        METRICS.increment('browser.bytes', int(driver.execute_script(TRANSFER_SIZE_SCRIPT) or 0))
+        METRICS.increment('browser.pages')
+    except Exception:
+        pass
+
+def setup_driver(lean=LEAN_BROWSING):
     try:
         print("Начало инициализации ChromeDriver...")
         
@@ -50,17 +190,14 @@ def setup_driver():
         chrome_options.add_argument('--disable-dev-shm-usage')
         chrome_options.add_argument('--disable-gpu')
         chrome_options.add_argument('--window-size=1920,1080')
+        if lean:
+            chrome_options.page_load_strategy = LEAN_PAGE_LOAD_STRATEGY
+            for argument in LEAN_ARGUMENTS:
+                chrome_options.add_argument(argument)
+            chrome_options.add_experimental_option('prefs', LEAN_PREFS)
         
-        # Используем ChromeDriverManager без явного указания версии
-        driver_path = ChromeDriverManager().install()
-        
-        # Проверяем и корректируем путь к chromedriver.exe
-        if not driver_path.endswith('chromedriver.exe'):
-            chrome_dir = os.path.dirname(driver_path)
-            for file in os.listdir(chrome_dir):
-                if file.endswith('chromedriver.exe'):
-                    driver_path = os.path.join(chrome_dir, file)
-                    break
+        # Без проверки версии в сети, если драйвер уже найден раньше
+        driver_path = resolve_driver_path()
         
         print(f"Путь к ChromeDriver: {driver_path}")
         
@@ -68,42 +205,130 @@ def setup_driver():
         service = Service(executable_path=driver_path)
         
         # Инициализация драйвера
-        driver = webdriver.Chrome(service=service, options=chrome_options)
+        with METRICS.timer('driver.start'):
+            driver = webdriver.Chrome(service=service, options=chrome_options)
+        if lean:
+            # Стили, шрифты, картинки и счетчики не загружаются совсем
+            driver.execute_cdp_cmd('Network.enable', {})
+            driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': BLOCKED_URLS})
         print("ChromeDriver успешно инициализирован")
         return driver
             
     except Exception as e:
+        METRICS.increment('driver.errors')
         print(f"Критическая ошибка при инициализации ChromeDriver: {str(e)}")
         print("\nДля исправления выполните команды:")
         print("1. Удалите папку:")
         print("   rmdir /s /q %USERPROFILE%\\.wdm")
         print("2. Выполните установку драйвера:")
         print("   pip install --upgrade webdriver-manager")
+        print(f"Или укажите путь к chromedriver в переменной окружения {CHROMEDRIVER_PATH_ENV}")
         return None
 
-def extract_email(contact_text):
-    """Извлекает email из текста контактных данных"""
-    if not contact_text:
-        return ''
-    lines = contact_text.split('\n')
-    for line in lines:
-        if '@' in line:
-            return line.strip()
-    return ''
-
-def check_operator_status(driver, inn):
+def driver_alive(driver):
+    """Проверка, что браузер и сессия WebDriver живы"""
+    try:
+        return driver.execute_script('return 1') == 1
+    except Exception:
+        return False
+
+class DriverPool:
+    """Прогретые браузеры, которые переживают отдельные запуски проверки.
+
+    Движок берет драйвер через acquire() и возвращает через release();
+    перед выдачей драйвер проверяется и при необходимости перезапускается.
+    """
+
+    def __init__(self, max_idle=8, lean=LEAN_BROWSING):
+        self.max_idle = max_idle
+        self.lean = lean
+        self.lock = threading.Lock()
+        self.idle = []
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                driver = self.idle.pop() if self.idle else None
+            if driver is None:
+                return setup_driver(self.lean)
+            if driver_alive(driver):
+                METRICS.increment('driver.reused')
+                return driver
+            print("Браузер из пула не отвечает, перезапуск")
+            METRICS.increment('driver.restarts')
+            quit_driver(driver)
+
+    def release(self, driver):
+        with self.lock:
+            if len(self.idle) < self.max_idle:
+                self.idle.append(driver)
+                return
+        quit_driver(driver)
+
+    def shutdown(self):
+        with self.lock:
+            drivers, self.idle = self.idle, []
+        for driver in drivers:
+            quit_driver(driver)
+
+def quit_driver(driver):
+    try:
+        driver.quit()
+    except Exception as e:
+        print(f"Ошибка при закрытии браузера: {str(e)}")
+
+# Таймауты ожидания по этапам проверки, секунды
+TIMEOUTS = {
+    'search_form': 15,  # поле ввода ИНН на странице поиска
+    'results': 15,      # таблица результатов #ResList1
+    'detail': 15        # готовность карточки оператора
+}
+
+# Фиксированная пауза, которая раньше выдерживалась после перехода в карточку
+LEGACY_DETAIL_SLEEP = 2.0
+
+RESPONSIBLE_XPATH = f"//td[contains(text(), '{RESPONSIBLE_LABEL}')]/following-sibling::td"
+
+# Проверка готовности карточки за один вызов WebDriver
+DETAIL_READY_SCRIPT = """
+return document.readyState === 'complete' || document.evaluate(
+    arguments[0], document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null
+).singleNodeValue !== null;
+"""
+
+def detail_page_ready(driver):
+    """Карточка готова, когда появилась первая нужная строка или документ загружен полностью"""
+    return driver.execute_script(DETAIL_READY_SCRIPT, RESPONSIBLE_XPATH)
+
+class EngineStopped(RuntimeError):
+    """Движок закрыт, пока проверка ждала очереди запросов; повтор не нужен"""
+
+def acquire_request(rate_limiter, stop_event=None):
+    """Ожидание очереди запросов, прерываемое остановкой движка"""
+    if not rate_limiter.acquire(stop_event):
+        raise EngineStopped("Движок остановлен")
+
+def search_operator(driver, inn, base_url=OPERATORS_LIST_URL, rate_limiter=RATE_LIMITER, timeouts=None,
+                    stop_event=None):
+    """Первый этап: поиск по ИНН в списке операторов, без перехода в карточку.
+
+    None - таблица результатов пуста (ИНН нет в реестре); таймаут, устаревший
+    элемент или упавший браузер - TransientError с причиной.
+    """
+    timeouts = {**TIMEOUTS, **(timeouts or {})}
     try:
-        url = 'https://pd.rkn.gov.ru/operators-registry/operators-list/'
+        url = base_url
         print(f"Открываем страницу: {url}")
-        driver.get(url)
-        
-        wait = WebDriverWait(driver, 15)
+        acquire_request(rate_limiter, stop_event)
+        with METRICS.timer('search.open_page'):
+            driver.get(url)
         
         # Ждем поле ввода ИНН
         print("Ожидаем поле ввода ИНН...")
-        inn_input = wait.until(
-            EC.presence_of_element_located((By.CSS_SELECTOR, "input[name='inn']"))
-        )
+        with METRICS.timer('search.form_wait'):
+            inn_input = WebDriverWait(driver, timeouts['search_form']).until(
+                EC.presence_of_element_located((By.CSS_SELECTOR, "input[name='inn']"))
+            )
         print("Поле ввода ИНН найдено")
         
         # Вводим ИНН
@@ -114,137 +339,242 @@ def check_operator_status(driver, inn):
         # Отправляем форму
         print("Отправляем форму...")
         form = driver.find_element(By.TAG_NAME, "form")
-        form.submit()
+        acquire_request(rate_limiter, stop_event)
+        with METRICS.timer('search.submit'):
+            form.submit()
         
         # Ждем появления результатов
         print("Ожидаем результаты...")
         try:
-            table = wait.until(
-                EC.presence_of_element_located((By.ID, "ResList1"))
-            )
-            
-            # Получаем строки с данными
-            rows = table.find_elements(By.XPATH, ".//tbody/tr")
-            if not rows:
-                print(f"Для ИНН {inn} нет данных в таблице")
-                return None
-            
-            # Сохраняем данные из таблицы в переменные
-            cells = None
-            detail_url = None
-            
-            # Получаем данные из первой строки и сохраняем их
-            cells = rows[0].find_elements(By.TAG_NAME, "td")
-            if len(cells) < 6:
-                print(f"Неверное количество столбцов в таблице: {len(cells)}")
-                return None
-                
-            # Получаем ссылку на детали до перехода на новую страницу
-            detail_link = cells[1].find_element(By.TAG_NAME, "a")
-            detail_url = detail_link.get_attribute("href")
-            
-            # Сохраняем основные данные
-            result = {
-                'reg_number': cells[0].text.strip(),
-                'name_inn': cells[1].text.strip(),
-                'operator_type': cells[2].text.strip(),
-                'inclusion_basis': cells[3].text.strip(),
-                'registration_date': cells[4].text.strip(),
-                'processing_start_date': cells[5].text.strip(),
-                'url': detail_url
-            }
-            
-            # Переходим на страницу деталей
-            print(f"Переход на страницу деталей: {detail_url}")
-            driver.get(detail_url)
-            time.sleep(2)  # Даем время на загрузку страницы
-            
-            try:
-                # Ищем информацию об ответственном лице с использованием полного XPath
-                responsible_xpath = "//td[contains(text(), 'ФИО физического лица или наименование юридического лица, ответственных за организацию обработки персональных данных')]/following-sibling::td"
-                responsible_element = wait.until(
-                    EC.presence_of_element_located((By.XPATH, responsible_xpath))
-                )
-                responsible_person = responsible_element.text.strip()
-                
-                # Ищем контактную информацию
-                contacts_xpath = "//td[contains(text(), 'номера их контактных телефонов, почтовые адреса и адреса электронной почты')]/following-sibling::td"
-                contacts_element = wait.until(
-                    EC.presence_of_element_located((By.XPATH, contacts_xpath))
+            with METRICS.timer('search.results_wait'):
+                WebDriverWait(driver, timeouts['results']).until(
+                    EC.presence_of_element_located((By.ID, "ResList1"))
                 )
-                contact_details = contacts_element.text.strip()
-                email = extract_email(contact_details)
-                
-                # Добавляем найденную информацию в результат
-                result.update({
-                    'responsible_person': responsible_person,
-                    'contact_details': contact_details,
-                    'email': email  # Добавляем email в результат
-                })
-                
-                print(f"Email получен: {email}")
-                
-            except Exception as e:
-                print(f"Ошибка при получении детальной информации: {str(e)}")
-                result.update({
-                    'responsible_person': 'Не указано',
-                    'contact_details': 'Не указано',
-                    'email': ''
-                })
+            rate_limiter.report_success()
             
+            # Таблица разбирается локально из одного снимка страницы
+            # вместо отдельного обращения к WebDriver за каждой ячейкой
+            with METRICS.timer('search.parse'):
+                result = parse_search_results(driver.page_source, base_url)
+            record_page_transfer(driver)
+            if result is None:
+                print(f"Для ИНН {inn} нет данных в таблице")
             return result
             
         except Exception as e:
-            print(f"Ошибка при поиске данных в таблице: {str(e)}")
-            return None
+            METRICS.increment('search.errors')
+            if isinstance(e, TimeoutException):
+                rate_limiter.report_throttle("таймаут поиска")
+            raise TransientError(f"ошибка при поиске данных в таблице: {type(e).__name__} {e}") from e
             
+    except (TransientError, EngineStopped):
+        raise
     except Exception as e:
-        print(f"Ошибка при проверке ИНН {inn}: {str(e)}")
-        print("\nHTML страницы:")
-        print(driver.page_source)
-        return None
+        METRICS.increment('search.errors')
+        if isinstance(e, TimeoutException):
+            rate_limiter.report_throttle("таймаут страницы")
+        raise TransientError(f"ошибка при открытии поиска: {type(e).__name__} {e}") from e
 
-def create_xml_report(results):
-    root = ET.Element('Операторы')
-    
-    for result in results:
-        operator = ET.SubElement(root, 'Оператор')
+def fetch_operator_details(driver, result, rate_limiter=RATE_LIMITER, timeouts=None, stop_event=None):
+    """Второй этап: ответственное лицо и контакты из карточки оператора.
+
+    Без ссылки на карточку повтор не поможет: результат поиска
+    возвращается сразу, без данных карточки.
+    """
+    timeouts = {**TIMEOUTS, **(timeouts or {})}
+    detail_url = result.get('url')
+    if not detail_url:
+        METRICS.increment('details.no_url')
+        print(f"Ссылка на карточку оператора {result.get('reg_number', '')} не найдена")
+        return result
+    try:
+        # Переходим на страницу деталей
+        print(f"Переход на страницу деталей: {detail_url}")
+        acquire_request(rate_limiter, stop_event)
+        with METRICS.timer('details.open_page'):
+            driver.get(detail_url)
         
-        if result['data']:
-            # Разделяем название и ИНН
-            name_inn = result['data']['name_inn']
-            name = name_inn.split('ИНН:')[0].strip()
-            inn = name_inn.split('ИНН:')[1].strip() if 'ИНН:' in name_inn else ''
-            
-            # Основная информация
-            ET.SubElement(operator, 'Регистрационный_номер').text = result['data']['reg_number']
-            ET.SubElement(operator, 'Наименование').text = name
-            ET.SubElement(operator, 'ИНН').text = inn
-            ET.SubElement(operator, 'Тип_оператора').text = result['data']['operator_type']
-            ET.SubElement(operator, 'Основание_включения').text = result['data']['inclusion_basis']
-            ET.SubElement(operator, 'Дата_регистрации').text = result['data']['registration_date']
-            ET.SubElement(operator, 'Дата_начала_обработки').text = result['data']['processing_start_date']
-            ET.SubElement(operator, 'Ссылка_на_карточку').text = result['data']['url']
-            
-            # Детальная информация
-            ET.SubElement(operator, 'Ответственное_лицо').text = result['data'].get('responsible_person', 'Не указано')
-            ET.SubElement(operator, 'Контактные_данные').text = result['data'].get('contact_details', 'Не указано')
+        # Ждем одно событие готовности вместо фиксированной паузы
+        wait_started = time.monotonic()
+        WebDriverWait(driver, timeouts['detail']).until(detail_page_ready)
+        waited = time.monotonic() - wait_started
+        METRICS.observe('details.ready_wait', waited)
+        print(f"Карточка готова за {waited:.2f} с, "
+              f"экономия {max(0.0, LEGACY_DETAIL_SLEEP - waited):.2f} с на ИНН")
+        
+        # Ответственное лицо, контакты и email разбираются из одного снимка страницы
+        with METRICS.timer('details.parse'):
+            result.update(parse_operator_details(driver.page_source))
+        record_page_transfer(driver)
+        rate_limiter.report_success()
+        
+        print(f"Email получен: {result['email']}")
+        
+    except EngineStopped:
+        raise
+    except Exception as e:
+        METRICS.increment('details.errors')
+        if isinstance(e, TimeoutException):
+            rate_limiter.report_throttle("таймаут карточки")
+        raise TransientError(f"ошибка загрузки карточки: {type(e).__name__} {e}") from e
+    
+    return result
+
+def check_operator_status(driver, inn, base_url=OPERATORS_LIST_URL, rate_limiter=RATE_LIMITER,
+                          details_cache=None, timeouts=None, stop_event=None):
+    result = search_operator(driver, inn, base_url, rate_limiter, timeouts, stop_event)
+    if result is None:
+        return None
+    
+    # Карточка уже есть в кэше - переход не нужен
+    details = details_cache.lookup_details(result['reg_number']) if details_cache else None
+    if details:
+        METRICS.increment('details.cache_hits')
+        print(f"Карточка {result['reg_number']} взята из кэша")
+        result.update(details)
+        return result
+    
+    return fetch_operator_details(driver, result, rate_limiter, timeouts, stop_event)
+
+class SeleniumEngine:
+    """Движок на headless Chrome: заполнение формы и переход в карточку через WebDriver.
+
+    С driver_pool браузер берется из пула прогретых и возвращается в него
+    при закрытии движка, а не завершается. После restart_after сбоев подряд
+    (или сразу, если браузер не отвечает) браузер перезапускается; если
+    перезапуск не удался, новый запуск пробуется после следующих restart_after
+    сбоев.
+    """
+    name = 'selenium'
+
+    def __init__(self, base_url=OPERATORS_LIST_URL, rate_limiter=RATE_LIMITER, timeouts=None,
+                 driver_pool=None, lean=LEAN_BROWSING, restart_after=3):
+        self.base_url = base_url
+        self.restart_after = restart_after
+        self.failures = 0
+        self.lean = lean
+        self.rate_limiter = rate_limiter
+        self.timeouts = timeouts
+        self.driver_pool = driver_pool
+        self.lock = threading.Lock()
+        self.busy = 0
+        self.closed = threading.Event()
+        self.driver = driver_pool.acquire() if driver_pool else setup_driver(lean)
+        if self.driver is None:
+            raise RuntimeError("Не удалось инициализировать ChromeDriver")
+
+    def call(self, func, *args):
+        """Вызов этапа проверки; сбои считаются, повторяет вызов конвейер"""
+        with self.lock:
+            self.busy += 1
+        try:
+            if self.closed.is_set():
+                raise EngineStopped("Движок остановлен")
+            if self.driver is None:
+                raise TransientError("браузер не запущен")
+            result = func(self.driver, *args)
+            self.failures = 0
+            return result
+        except TransientError:
+            self.failures += 1
+            # Без браузера (прошлый перезапуск не удался) запуск пробуется снова по порогу
+            if self.failures >= self.restart_after or \
+                    (self.driver is not None and not driver_alive(self.driver)):
+                self.restart()
+            raise
+        finally:
+            with self.lock:
+                self.busy -= 1
+
+    def restart(self):
+        print(f"Браузер перезапускается после сбоев подряд: {self.failures}")
+        METRICS.increment('driver.restarts')
+        if self.driver is not None:
+            quit_driver(self.driver)
+            self.driver = None
+        self.failures = 0
+        if self.closed.is_set():
+            return
+        self.driver = setup_driver(self.lean)
+        if self.driver is None:
+            raise TransientError("не удалось перезапустить ChromeDriver")
+
+    def search(self, inn):
+        return self.call(search_operator, inn, self.base_url, self.rate_limiter, self.timeouts, self.closed)
+
+    def fetch_details(self, inn, result):
+        return self.call(fetch_operator_details, result, self.rate_limiter, self.timeouts, self.closed)
+
+    def check(self, inn):
+        result = self.search(inn)
+        return self.fetch_details(inn, result) if result else None
+
+    def close(self):
+        self.closed.set()
+        with self.lock:
+            driver, self.driver = self.driver, None
+            busy = self.busy
+        if driver is None:
+            return
+        # Браузер посреди запроса (остановка проверки) не возвращается в пул
+        if self.driver_pool and not busy:
+            self.driver_pool.release(driver)
         else:
-            ET.SubElement(operator, 'ИНН').text = result['inn']
-            ET.SubElement(operator, 'Статус').text = 'Не найден в реестре'
+            quit_driver(driver)
+
+# Доступные движки проверки: имя -> класс
+ENGINES = {
+    'selenium': SeleniumEngine,
+    'http': HttpEngine,
+    'index': IndexEngine
+}
+
+def engine_uses_cache(name):
+    """Нужен ли движку кэш результатов"""
+    return getattr(ENGINES[name], 'cacheable', True)
 
-    xmlstr = minidom.parseString(ET.tostring(root, encoding='utf-8')).toprettyxml(indent="    ")
-    with open('report.xml', 'w', encoding='utf-8') as f:
-        f.write(xmlstr)
+def create_engine(name='selenium', cache=None, **options):
+    """Создает движок проверки по имени, при наличии кэша - с чтением через кэш.
 
-def create_excel_report(results):
+    Движки без обращения к сайту (cacheable = False) через кэш не оборачиваются.
+    """
+    if name not in ENGINES:
+        raise ValueError(f"Неизвестный движок: {name}. Доступны: {', '.join(ENGINES)}")
+    engine = ENGINES[name](**options)
+    if cache is not None and engine_uses_cache(name):
+        engine = CachedEngine(engine, cache)
+    return engine
+
+def create_xml_report(results, cache=None, filename='report.xml'):
+    with METRICS.timer('report.xml'):
+        fill_details_from_cache(results, cache)
+        with XmlReportWriter(filename) as writer:
+            writer.write_all(results)
+
+# Столбцы Excel-отчета
+EXCEL_COLUMNS = [
+    'ИНН',
+    'Статус',
+    'Регистрационный номер',
+    'Наименование',
+    'Тип оператора',
+    'Основание включения',
+    'Дата регистрации',
+    'Дата начала обработки',
+    'Ответственное лицо',
+    'Контактные данные',
+    'Email',
+    'Ссылка на карточку'
+]
+
+def create_excel_report(results, cache=None, filename='report.xlsx'):
+    started = time.perf_counter()
+    fill_details_from_cache(results, cache)
     data = []
     for result in results:
         if result['data']:
             # Разделяем название и ИНН
-            name_inn = result['data']['name_inn']
-            name = name_inn.split('ИНН:')[0].strip()
-            inn = name_inn.split('ИНН:')[1].strip() if 'ИНН:' in name_inn else ''
+            name, inn = split_name_inn(result['data']['name_inn'])
             
             data.append({
                 'ИНН': inn,
@@ -263,7 +593,7 @@ def create_excel_report(results):
         else:
             data.append({
                 'ИНН': result['inn'],
-                'Статус': 'Не найден в реестре',
+                'Статус': status_label(result),
                 'Регистрационный номер': '',
                 'Наименование': '',
                 'Тип оператора': '',
@@ -276,103 +606,141 @@ def create_excel_report(results):
                 'Ссылка на карточку': ''
             })
 
-    # Создаем DataFrame
-    df = pd.DataFrame(data)
-    
-    # Настройка форматирования Excel остается прежней
-    with pd.ExcelWriter('report.xlsx', engine='openpyxl') as writer:
-        # Записываем DataFrame в Excel
-        df.to_excel(writer, index=False, sheet_name='Операторы')
-        
-        # Получаем рабочий лист
-        worksheet = writer.sheets['Операторы']
-        
-        # Настраиваем формат для заголовков
-        header_format = {
-            'bg_color': '#4F81BD',
-            'font_color': 'white',
-            'bold': True,
-            'text_wrap': True,
-            'valign': 'top',
-            'border': 1
-        }
-        
-        # Настраиваем автоширину столбцов и форматирование
-        for idx, column in enumerate(worksheet.columns):
-            max_length = 0
-            column = [cell for cell in column]
-            
-            # Форматируем заголовок
-            header_cell = column[0]
-            header_cell.fill = PatternFill(start_color='4F81BD', end_color='4F81BD', fill_type='solid')
-            header_cell.font = Font(color='FFFFFF', bold=True)
-            header_cell.alignment = Alignment(wrap_text=True, vertical='top')
-            header_cell.border = Border(
-                left=Side(style='thin'),
-                right=Side(style='thin'),
-                top=Side(style='thin'),
-                bottom=Side(style='thin')
-            )
-            
-            # Определяем максимальную ширину столбца
-            for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            
-            # Устанавливаем ширину столбца
-            adjusted_width = min(max_length + 2, 50)  # Ограничиваем максимальную ширину
-            worksheet.column_dimensions[column[0].column_letter].width = adjusted_width
-            
-            # Форматируем все ячейки в столбце
-            for cell in column[1:]:  # Пропускаем заголовок
-                cell.alignment = Alignment(wrap_text=True, vertical='top')
-                cell.border = Border(
-                    left=Side(style='thin'),
-                    right=Side(style='thin'),
-                    top=Side(style='thin'),
-                    bottom=Side(style='thin')
-                )
-        
-        # Добавляем фильтры
-        worksheet.auto_filter.ref = worksheet.dimensions
-        
-        # Замораживаем первую строку
-        worksheet.freeze_panes = 'A2'
+    # Создаем DataFrame и записываем его в потоковом режиме
+    df = pd.DataFrame(data, columns=EXCEL_COLUMNS)
+    METRICS.observe('report.excel.prepare', time.perf_counter() - started)
+    write_excel_report(df, filename, status_column='Статус')
 
-def main():
+def main(engine_name='selenium', workers=1, rate=1.0, burst=2, use_cache=True, resume=True,
+         details=DETAILS_ALL, detail_workers=None, detail_rate=None,
+         parquet_path=None, partition_by_date=False, metrics_path=None,
+         input_file='inn.txt', column=None, retries=3, previous_report=None, changes_file='changes.xlsx'):
+    # Карточки "по запросу" догружаются кнопкой в интерфейсе; здесь запросить их некому
+    if details not in (DETAILS_ALL, DETAILS_NONE):
+        raise ValueError(f"Режим карточек {details} недоступен при запуске из командной строки: all или none")
     print("Начало работы программы")
-    # Читаем список ИНН
-    inn_list = read_inn_list('inn.txt')
-    print(f"Загружено {len(inn_list)} ИНН из файла")
-    results = []
+    METRICS.reset()
+    # Читаем список ИНН (TXT/CSV/XLSX): некорректные ИНН в реестр не отправляются,
+    # повторяющиеся проверяются один раз
+    records = read_inn_records(input_file, column)
+    inn_list = unique_inns(records)
+    occurrences = Counter(record.inn for record in records if record.error is None)
+    invalid = [invalid_result(record) for record in records if record.error is not None]
+    print(f"Загружено из файла {input_file}: {describe_records(records)}")
+    
+    # Прошлый отчет: читается до записи новых отчетов (может быть тем же report.xml);
+    # карточки открываются только для новых и изменившихся операторов
+    snapshot = None
+    if previous_report:
+        snapshot = load_snapshot(previous_report)
+        print(f"Загружен прошлый отчет {previous_report}: {len(snapshot)} ИНН")
+    
+    # Журнал завершенных ИНН: после сбоя или остановки проверка продолжается с места обрыва
+    journal = RunJournal(journal_path_for(input_file))
+    done = journal.load() if resume else {}
+    if done:
+        print(f"Найден журнал незавершенной проверки: {len(done)} ИНН уже проверено")
+    journal.open(resume)
+    pending = [inn for inn in inn_list if inn not in done]
+    
+    def report_rows(results):
+        # Строка отчета на каждое вхождение ИНН во входном файле
+        for result in results:
+            for _ in range(occurrences.get(result['inn'], 1)):
+                yield result
+    
+    # XML-отчет пишется по мере проверки: некорректные ИНН и проверенные по журналу - сразу
+    xml_writer = XmlReportWriter('report.xml').open()
+    xml_writer.write_all(invalid)
+    xml_writer.write_all(report_rows(done[inn] for inn in inn_list if inn in done))
+    
+    # Parquet пишется группами строк по мере проверки
+    parquet_store = ParquetResultStore(parquet_path, partition_by_date=partition_by_date) if parquet_path else None
+    if parquet_store:
+        parquet_store.write_all(invalid)
+        parquet_store.write_all(report_rows(done[inn] for inn in inn_list if inn in done))
     
-    # Инициализируем драйвер
-    print("Инициализация браузера...")
-    driver = setup_driver()
+    def on_result(index, result, completed, total):
+        journal.append(result)
+        xml_writer.write_all(report_rows([result]))
+        if parquet_store:
+            parquet_store.write_all(report_rows([result]))
+        print(f"[{completed}/{total}] ИНН {result['inn']} {status_label(result).lower()}")
+    
+    # Общий лимит запросов к реестру для всех потоков вместо паузы после каждого ИНН
+    RATE_LIMITER.configure(rate, burst)
+    print(f"Лимит запросов: {rate}/с, запас: {burst}")
+    # Этап карточек может иметь собственный лимит, иначе делит общий
+    detail_limiter = RateLimiter(detail_rate, burst) if detail_rate else RATE_LIMITER
+    
+    # Кэш результатов: в сеть идут только новые и устаревшие ИНН
+    cache = ResultCache() if use_cache and engine_uses_cache(engine_name) else None
+    
+    def make_engine(limiter):
+        engine = create_engine(engine_name, cache, rate_limiter=limiter)
+        return SnapshotEngine(engine, snapshot) if snapshot is not None else engine
+    
+    # Конвейер: потоки поиска и потоки карточек, у каждого свой браузер / HTTP-сессия
+    detail_workers = detail_workers or workers
+    print(f"Инициализация движка: {engine_name}, потоков поиска: {workers}, "
+          f"карточек: {detail_workers if details == DETAILS_ALL else 0}...")
+    pool = TwoStagePipeline(make_engine,
+                            search_workers=workers, detail_workers=detail_workers,
+                            details=details, on_result=on_result,
+                            search_limiter=RATE_LIMITER, detail_limiter=detail_limiter,
+                            retry=RetryPolicy(retries))
     
     try:
-        # Проверяем каждый ИНН
-        for inn in inn_list:
-            print(f"\nПроверка ИНН: {inn}")
-            data = check_operator_status(driver, inn)
-            results.append({'inn': inn, 'data': data})
-            print("Ожидание перед следующим запросом...")
-            time.sleep(3)
+        new_results = pool.run(pending)
+        by_inn = dict(done)
+        by_inn.update((result['inn'], result) for result in new_results)
+        # Результаты по строкам входного файла, с повторами и некорректными ИНН
+        results = fan_out(records, by_inn)
         
         # Создаем отчеты
         print("\nСоздание отчетов...")
-        create_xml_report(results)
-        print("XML-отчет сформирован в файле report.xml")
-        create_excel_report(results)
+        xml_writer.close()
+        print(f"XML-отчет сформирован в файле report.xml ({xml_writer.count} записей)")
+        create_excel_report(results, cache)
         print("Excel-отчет сформирован в файле report.xlsx")
+        if parquet_store:
+            parquet_store.close()
+            print(f"Parquet сформирован в файле {parquet_store.path} ({parquet_store.count} записей)")
+        if snapshot is not None:
+            changes = diff_results(snapshot, [by_inn[inn] for inn in inn_list if inn in by_inn])
+            write_changes_report(changes, changes_file)
+            print(f"Отчет об изменениях сформирован в файле {changes_file} ({describe_changes(changes)})")
+        
+        # ИНН, не проверенные из-за сбоев, можно проверить отдельным запуском
+        failed_path = failed_path_for(input_file)
+        failed = write_failed_list(failed_path, new_results)
+        if failed:
+            print(f"Не удалось проверить ИНН: {failed}. Список для повторной проверки: {failed_path}")
+        
+        # Проверка завершена полностью - журнал больше не нужен
+        if all(inn in by_inn for inn in inn_list):
+            journal.remove()
         
     finally:
-        # Закрываем браузер
-        print("Закрытие браузера...")
-        driver.quit()
+        # Закрываем браузеры / HTTP-сессии
+        print("Закрытие движков...")
+        pool.stop()
+        journal.close()
+        xml_writer.close()
+        if parquet_store:
+            parquet_store.close()
+        if cache:
+            print(cache.summary())
+            cache.close()
+        # Время по этапам: где тратится время проверки
+        print("\nЗамеры по этапам:")
+        print(METRICS.summary())
+        if metrics_path:
+            METRICS.export(metrics_path)
+            print(f"Метрики сохранены в файл {metrics_path}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main(sys.argv[1] if len(sys.argv) > 1 else 'selenium',
+         int(sys.argv[2]) if len(sys.argv) > 2 else 1,
+         float(sys.argv[3]) if len(sys.argv) > 3 else 1.0,
+         details=sys.argv[4] if len(sys.argv) > 4 else DETAILS_ALL)
\ No newline at end of file
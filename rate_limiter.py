@@ -0,0 +1,107 @@
+"""Общий ограничитель частоты запросов к реестру (token bucket с адаптацией скорости)"""
+import threading
+import time
+from metrics import METRICS
+
+# Коды ответа, означающие перегрузку сайта
+THROTTLE_STATUS_CODES = (429, 503)
+
+
+class RateLimiter:
+    """Token bucket: rate - запросов в секунду, burst - размер корзины.
+
+    При ответах 429/503 и таймаутах скорость уменьшается вдвое (не ниже
+    min_rate), после success_window успешных запросов подряд - плавно
+    возвращается к заданной.
+    """
+
+    def __init__(self, rate=1.0, burst=2, min_rate=0.05, backoff=0.5,
+                 recovery_step=0.1, success_window=10):
+        self.lock = threading.Lock()
+        self.min_rate = min_rate
+        self.backoff = backoff
+        self.recovery_step = recovery_step
+        self.success_window = success_window
+        self.configure(rate, burst)
+
+    def configure(self, rate, burst=None):
+        """Задает целевую скорость и размер корзины, сбрасывая адаптацию"""
+        if rate <= 0:
+            raise ValueError("Скорость запросов должна быть больше нуля")
+        with self.lock:
+            self.target_rate = float(rate)
+            self.rate = float(rate)
+            if burst is not None:
+                self.burst = max(1, int(burst))
+            self.tokens = float(self.burst)
+            self.updated = time.monotonic()
+            self.paused_until = 0.0
+            self.success_streak = 0
+
+    def refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, stop_event=None):
+        """Ждет свободный токен. Возвращает False, если ожидание прервано stop_event"""
+        with METRICS.timer('rate_limiter.wait'):
+            return self.wait_token(stop_event)
+
+    def wait_token(self, stop_event):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.refill(now)
+                if now < self.paused_until:
+                    wait = self.paused_until - now
+                elif self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                else:
+                    wait = (1 - self.tokens) / self.rate
+
+            if stop_event is not None:
+                if stop_event.wait(wait):
+                    return False
+            else:
+                time.sleep(wait)
+
+    def report_success(self):
+        """Успешный запрос: после серии успехов скорость растет до целевой"""
+        with self.lock:
+            if self.rate >= self.target_rate:
+                return
+            self.success_streak += 1
+            if self.success_streak < self.success_window:
+                return
+            self.success_streak = 0
+            self.refill(time.monotonic())
+            self.rate = min(self.target_rate, self.rate + self.target_rate * self.recovery_step)
+            rate = self.rate
+        print(f"Скорость запросов восстановлена до {rate:.2f}/с")
+
+    def report_throttle(self, reason, retry_after=None):
+        """Ответ 429/503 или таймаут: скорость снижается, при Retry-After - пауза"""
+        METRICS.increment('rate_limiter.throttled')
+        with self.lock:
+            now = time.monotonic()
+            self.refill(now)
+            self.success_streak = 0
+            self.rate = max(self.min_rate, self.rate * self.backoff)
+            self.tokens = min(self.tokens, 0.0)
+            if retry_after:
+                self.paused_until = max(self.paused_until, now + retry_after)
+            rate = self.rate
+        print(f"Сайт ограничивает запросы ({reason}), скорость снижена до {rate:.2f}/с")
+
+
+def parse_retry_after(value):
+    """Значение заголовка Retry-After в секундах (поддерживается только число)"""
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+# Общий ограничитель для всех движков и потоков
+RATE_LIMITER = RateLimiter()
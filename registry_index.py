@@ -0,0 +1,224 @@
+"""Локальный индекс реестра операторов, построенный из выгрузки (открытых данных) РКН"""
+import csv
+import json
+import os
+import sqlite3
+import sys
+import xml.etree.ElementTree as ET
+from registry_parser import OPERATORS_LIST_URL, extract_email
+
+DEFAULT_INDEX_PATH = 'registry_index.sqlite3'
+
+# Возможные имена полей выгрузки (тег XML или заголовок CSV, без учета регистра)
+FIELD_ALIASES = {
+    'reg_number': ('regn', 'reg_number', 'registration_number', 'регистрационный номер'),
+    'name': ('name_full', 'name', 'full_name', 'наименование'),
+    'inn': ('inn', 'инн'),
+    'operator_type': ('pd_operator_type', 'operator_type', 'type', 'тип оператора'),
+    'inclusion_basis': ('basis', 'enter_order', 'inclusion_basis', 'основание включения'),
+    'registration_date': ('reg_date', 'registration_date', 'enter_date', 'дата регистрации'),
+    'processing_start_date': ('startdate', 'start_date', 'processing_start_date',
+                              'дата начала обработки'),
+    'responsible_person': ('rspn_person', 'resp_name', 'responsible_person', 'ответственное лицо'),
+    'contact_details': ('rspn_contacts', 'contacts', 'contact_details', 'контактные данные')
+}
+
+# Имена элементов-записей в XML-выгрузке
+RECORD_TAGS = ('record', 'operator')
+
+
+def local_name(tag):
+    """Имя тега без пространства имен: {ns}record -> record, rkn:record -> record"""
+    return tag.rsplit('}', 1)[-1].rsplit(':', 1)[-1].lower()
+
+
+def build_alias_map(field_aliases=FIELD_ALIASES):
+    return {alias.lower(): field for field, aliases in field_aliases.items() for alias in aliases}
+
+
+def normalize_date(value):
+    """Дата в формате реестра ДД.ММ.ГГГГ (выгрузка может содержать ГГГГ-ММ-ДД)"""
+    value = (value or '').strip()
+    if len(value) >= 10 and value[4] == '-' and value[7] == '-':
+        return f"{value[8:10]}.{value[5:7]}.{value[:4]}"
+    return value
+
+
+def record_to_result(fields):
+    """Словарь в формате результата check_operator_status из полей записи выгрузки"""
+    reg_number = fields.get('reg_number', '').strip()
+    inn = fields.get('inn', '').strip()
+    contact_details = fields.get('contact_details', '').strip()
+    return {
+        'reg_number': reg_number,
+        'name_inn': f"{fields.get('name', '').strip()} ИНН: {inn}",
+        'operator_type': fields.get('operator_type', '').strip(),
+        'inclusion_basis': fields.get('inclusion_basis', '').strip(),
+        'registration_date': normalize_date(fields.get('registration_date')),
+        'processing_start_date': normalize_date(fields.get('processing_start_date')),
+        'url': f"{OPERATORS_LIST_URL}?id={reg_number}",
+        'responsible_person': fields.get('responsible_person', '').strip() or 'Не указано',
+        'contact_details': contact_details or 'Не указано',
+        'email': extract_email(contact_details)
+    }
+
+
+def iter_xml_records(path, alias_map):
+    """Потоковый разбор XML через iterparse: в памяти только текущая запись.
+
+    Записи могут лежать во вложенных обертках (разделы, страницы выгрузки):
+    разобранная запись очищается и удаляется из своего родителя, а не из
+    корня, поэтому обертки не копят уже обработанные записи.
+    """
+    # Открытые элементы от корня до текущего: родитель берется со стека
+    parents = []
+    fields = None
+    for event, elem in ET.iterparse(path, events=('start', 'end')):
+        name = local_name(elem.tag)
+        if event == 'start':
+            parents.append(elem)
+            if name in RECORD_TAGS:
+                fields = {}
+            continue
+
+        parents.pop()
+        if name in RECORD_TAGS and fields is not None:
+            yield fields
+            fields = None
+        elif fields is not None:
+            if name in alias_map:
+                fields.setdefault(alias_map[name], ''.join(elem.itertext()).strip())
+            # Поля записи удаляются вместе с ней
+            continue
+        # Обработанные записи и элементы вне записей удаляются из дерева, память не растет
+        elem.clear()
+        if parents:
+            parents[-1].remove(elem)
+
+
+def iter_csv_records(path, alias_map, encoding='utf-8-sig'):
+    """Потоковое чтение CSV с автоопределением разделителя"""
+    with open(path, 'r', encoding=encoding, newline='') as f:
+        sample = f.read(64 * 1024)
+        f.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=';,\t|')
+        except csv.Error:
+            dialect = csv.excel
+        reader = csv.DictReader(f, dialect=dialect)
+        columns = {column: alias_map.get(column.strip().lower()) for column in reader.fieldnames or []}
+        for row in reader:
+            yield {field: row[column] or '' for column, field in columns.items() if field}
+
+
+def ingest_dump(dump_path, index_path=DEFAULT_INDEX_PATH, batch_size=5000, field_aliases=FIELD_ALIASES):
+    """Строит индекс по ИНН и регистрационному номеру из XML/CSV-выгрузки реестра.
+
+    Индекс собирается во временном файле и заменяет старый только после
+    успешного окончания разбора. Возвращает количество загруженных записей.
+    """
+    alias_map = build_alias_map(field_aliases)
+    if dump_path.lower().endswith('.csv'):
+        records = iter_csv_records(dump_path, alias_map)
+    else:
+        records = iter_xml_records(dump_path, alias_map)
+
+    tmp_path = index_path + '.tmp'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    conn.execute('PRAGMA journal_mode = OFF')
+    conn.execute('PRAGMA synchronous = OFF')
+    conn.execute('''CREATE TABLE operators (
+        reg_number TEXT,
+        inn TEXT NOT NULL,
+        data TEXT NOT NULL)''')
+
+    count = 0
+    batch = []
+    try:
+        for fields in records:
+            inn = fields.get('inn', '').strip()
+            if not inn:
+                continue
+            result = record_to_result(fields)
+            batch.append((result['reg_number'], inn, json.dumps(result, ensure_ascii=False)))
+            if len(batch) >= batch_size:
+                conn.executemany('INSERT INTO operators VALUES (?, ?, ?)', batch)
+                count += len(batch)
+                batch = []
+                print(f"Загружено записей: {count}")
+        if batch:
+            conn.executemany('INSERT INTO operators VALUES (?, ?, ?)', batch)
+            count += len(batch)
+
+        # Индексы строятся один раз после загрузки - так быстрее, чем при каждой вставке
+        conn.execute('CREATE INDEX operators_inn ON operators (inn)')
+        conn.execute('CREATE INDEX operators_reg_number ON operators (reg_number)')
+        conn.commit()
+    finally:
+        conn.close()
+
+    os.replace(tmp_path, index_path)
+    print(f"Индекс {index_path} построен: {count} записей")
+    return count
+
+
+class RegistryIndex:
+    """Поиск в локальном индексе по ИНН и регистрационному номеру"""
+
+    def __init__(self, index_path=DEFAULT_INDEX_PATH):
+        if not os.path.exists(index_path):
+            raise FileNotFoundError(f"Индекс реестра не найден: {index_path}. "
+                                    f"Постройте его командой: python registry_index.py <выгрузка>")
+        self.conn = sqlite3.connect(f"file:{index_path}?mode=ro", uri=True, check_same_thread=False)
+
+    def find_by_inn(self, inn):
+        row = self.conn.execute(
+            'SELECT data FROM operators WHERE inn = ? ORDER BY rowid LIMIT 1', (inn,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def find_by_reg_number(self, reg_number):
+        row = self.conn.execute(
+            'SELECT data FROM operators WHERE reg_number = ? LIMIT 1', (reg_number,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def close(self):
+        self.conn.close()
+
+
+class IndexEngine:
+    """Движок поиска по локальному индексу вместо браузера и сети"""
+    name = 'index'
+    # Кэш результатов не нужен: индекс сам локальный, а после загрузки новой
+    # выгрузки кэш отдавал бы устаревшие данные до истечения срока жизни
+    cacheable = False
+
+    def __init__(self, index_path=DEFAULT_INDEX_PATH, rate_limiter=None):
+        # rate_limiter не нужен: обращений к сайту нет
+        self.index = RegistryIndex(index_path)
+
+    def search(self, inn):
+        result = self.index.find_by_inn(inn)
+        if result is None:
+            print(f"ИНН {inn} не найден в локальном индексе")
+        return result
+
+    def fetch_details(self, inn, result):
+        # Данные карточки уже есть в индексе
+        return result
+
+    def check(self, inn):
+        return self.search(inn)
+
+    def close(self):
+        self.index.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Использование: python registry_index.py <выгрузка.xml|.csv> [индекс.sqlite3]")
+        sys.exit(1)
+    ingest_dump(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else DEFAULT_INDEX_PATH)
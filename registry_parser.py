@@ -0,0 +1,136 @@
+"""Разбор HTML-страниц реестра операторов персональных данных (pd.rkn.gov.ru)"""
+from urllib.parse import urljoin
+from bs4 import BeautifulSoup, SoupStrainer
+
+# lxml разбирает HTML на C в несколько раз быстрее встроенного парсера, если он установлен
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = 'lxml'
+except ImportError:
+    HTML_PARSER = 'html.parser'
+
+# Разбирается только нужная часть страницы, остальная разметка пропускается
+RESULTS_STRAINER = SoupStrainer(id='ResList1')
+DETAILS_STRAINER = SoupStrainer('tr')
+
+OPERATORS_LIST_URL = 'https://pd.rkn.gov.ru/operators-registry/operators-list/'
+
+# Подписи строк в карточке оператора, по которым ищутся нужные значения
+RESPONSIBLE_LABEL = 'ФИО физического лица или наименование юридического лица, ответственных за организацию обработки персональных данных'
+CONTACTS_LABEL = 'номера их контактных телефонов, почтовые адреса и адреса электронной почты'
+
+# Поля строки таблицы #ResList1 в порядке столбцов
+LIST_FIELDS = [
+    'reg_number',
+    'name_inn',
+    'operator_type',
+    'inclusion_basis',
+    'registration_date',
+    'processing_start_date'
+]
+
+
+class ResultsPageError(ValueError):
+    """Страница не похожа на результаты поиска: нет таблицы #ResList1 или у нее другие столбцы.
+
+    Так выглядят капча, технические работы и страницы ошибок с кодом 200 -
+    это сбой проверки, а не "ИНН не найден".
+    """
+
+
+def extract_email(contact_text):
+    """Извлекает email из текста контактных данных"""
+    if not contact_text:
+        return ''
+    lines = contact_text.split('\n')
+    for line in lines:
+        if '@' in line:
+            return line.strip()
+    return ''
+
+
+def cell_text(tag):
+    """Текст ячейки так, как его показывает браузер: <br> - перенос строки, пробелы схлопнуты"""
+    for br in tag.find_all('br'):
+        br.replace_with('\n')
+    lines = (' '.join(line.split()) for line in tag.get_text().split('\n'))
+    return '\n'.join(line for line in lines if line)
+
+
+def parse_search_form(html, base_url=OPERATORS_LIST_URL):
+    """Находит форму поиска с полем inn и возвращает её адрес, метод и поля"""
+    soup = BeautifulSoup(html, HTML_PARSER)
+    inn_input = soup.select_one("input[name='inn']")
+    form = inn_input.find_parent('form') if inn_input else soup.find('form')
+    if form is None:
+        return None
+
+    fields = {}
+    for element in form.find_all(['input', 'select', 'textarea']):
+        name = element.get('name')
+        if not name or element.get('type') in ('submit', 'button', 'image', 'reset'):
+            continue
+        if element.name == 'select':
+            option = element.find('option', selected=True) or element.find('option')
+            fields[name] = option.get('value', option.get_text()) if option else ''
+        elif element.get('type') in ('checkbox', 'radio'):
+            if element.has_attr('checked'):
+                fields[name] = element.get('value', 'on')
+        else:
+            fields[name] = element.get('value', '')
+
+    return {
+        'action': urljoin(base_url, form.get('action') or base_url),
+        'method': (form.get('method') or 'get').lower(),
+        'fields': fields
+    }
+
+
+def parse_search_results(html, base_url=OPERATORS_LIST_URL):
+    """Разбирает первую строку таблицы #ResList1.
+
+    None - таблица есть, но строк с данными нет (ИНН не найден); без таблицы
+    или при неверном количестве столбцов - ResultsPageError.
+    """
+    soup = BeautifulSoup(html, HTML_PARSER, parse_only=RESULTS_STRAINER)
+    table = soup.find(id='ResList1')
+    if table is None:
+        raise ResultsPageError("на странице нет таблицы результатов #ResList1")
+
+    body = table.find('tbody') or table
+    for row in body.find_all('tr'):
+        cells = row.find_all('td')
+        if not cells:
+            # Строка заголовка
+            continue
+        if len(cells) < len(LIST_FIELDS):
+            raise ResultsPageError(f"неверное количество столбцов в таблице: {len(cells)}")
+
+        link = cells[1].find('a')
+        result = {field: cell_text(cell) for field, cell in zip(LIST_FIELDS, cells)}
+        result['url'] = urljoin(base_url, link['href']) if link and link.get('href') else None
+        return result
+
+    return None
+
+
+def parse_operator_details(html):
+    """Извлекает ответственное лицо и контакты из карточки оператора"""
+    soup = BeautifulSoup(html, HTML_PARSER, parse_only=DETAILS_STRAINER)
+    values = {}
+    for row in soup.find_all('tr'):
+        cells = row.find_all('td')
+        if len(cells) < 2:
+            continue
+        label = cells[0].get_text()
+        if RESPONSIBLE_LABEL in label:
+            values['responsible_person'] = cell_text(cells[1])
+        elif CONTACTS_LABEL in label:
+            values['contact_details'] = cell_text(cells[1])
+
+    contact_details = values.get('contact_details', 'Не указано')
+    return {
+        'responsible_person': values.get('responsible_person', 'Не указано'),
+        'contact_details': contact_details,
+        'email': extract_email(values.get('contact_details', ''))
+    }
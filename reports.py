@@ -0,0 +1,200 @@
+"""Запись отчетов по результатам проверки"""
+import threading
+from xml.sax.saxutils import escape
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.formatting.rule import CellIsRule
+from openpyxl.styles import NamedStyle, PatternFill, Font, Alignment, Border, Side
+from openpyxl.utils import get_column_letter
+from metrics import METRICS
+
+# Кавычки экранируются так же, как это делал minidom в прежнем отчете
+XML_ENTITIES = {'"': '&quot;'}
+
+THIN_BORDER = Border(
+    left=Side(style='thin'),
+    right=Side(style='thin'),
+    top=Side(style='thin'),
+    bottom=Side(style='thin')
+)
+
+# Заливка статуса задается правилами условного форматирования, а не каждой ячейке
+FOUND_FILL = PatternFill(start_color='90EE90', end_color='90EE90', fill_type='solid')
+NOT_FOUND_FILL = PatternFill(start_color='FFB6C1', end_color='FFB6C1', fill_type='solid')
+
+
+# Подписи статусов в отчетах
+STATUS_LABELS = {
+    'found': 'Найден',
+    'not_found': 'Не найден в реестре',
+    'invalid': 'Некорректный ИНН',
+    'error': 'Ошибка проверки'
+}
+
+
+def result_status(result):
+    """Машиночитаемый статус результата проверки"""
+    return result.get('status') or ('found' if result['data'] else 'not_found')
+
+
+def status_label(result):
+    """Статус для отчета; для некорректного ИНН и ошибки проверки - с причиной"""
+    label = STATUS_LABELS[result_status(result)]
+    return f"{label}: {result['error']}" if result.get('error') else label
+
+
+def split_name_inn(name_inn):
+    """Разделяет строку "Наименование ИНН: 1234567890" на наименование и ИНН"""
+    name = name_inn.split('ИНН:')[0].strip()
+    inn = name_inn.split('ИНН:')[1].strip() if 'ИНН:' in name_inn else ''
+    return name, inn
+
+
+def xml_operator_fields(result):
+    """Пары (тег, значение) элемента <Оператор> для одного результата"""
+    data = result['data']
+    if not data:
+        return [
+            ('ИНН', result['inn']),
+            ('Статус', status_label(result))
+        ]
+
+    name, inn = split_name_inn(data['name_inn'])
+    return [
+        # Основная информация
+        ('Регистрационный_номер', data['reg_number']),
+        ('Наименование', name),
+        ('ИНН', inn),
+        ('Тип_оператора', data['operator_type']),
+        ('Основание_включения', data['inclusion_basis']),
+        ('Дата_регистрации', data['registration_date']),
+        ('Дата_начала_обработки', data['processing_start_date']),
+        ('Ссылка_на_карточку', data['url']),
+        # Детальная информация
+        ('Ответственное_лицо', data.get('responsible_person', 'Не указано')),
+        ('Контактные_данные', data.get('contact_details', 'Не указано'))
+    ]
+
+
+class XmlReportWriter:
+    """Потоковая запись XML-отчета: каждый <Оператор> пишется в файл сразу.
+
+    Документ не держится в памяти целиком, а файл растет по мере проверки,
+    поэтому при сбое остается частично записанный отчет.
+    """
+
+    def __init__(self, filename='report.xml', indent='    '):
+        self.filename = filename
+        self.indent = indent
+        self.lock = threading.Lock()
+        self.file = None
+        self.count = 0
+
+    def open(self):
+        self.file = open(self.filename, 'w', encoding='utf-8')
+        self.file.write('<?xml version="1.0" ?>\n<Операторы>\n')
+        self.file.flush()
+        return self
+
+    def write(self, result):
+        lines = [f"{self.indent}<Оператор>\n"]
+        for tag, value in xml_operator_fields(result):
+            if value:
+                lines.append(f"{self.indent * 2}<{tag}>{escape(str(value), XML_ENTITIES)}</{tag}>\n")
+            else:
+                lines.append(f"{self.indent * 2}<{tag}/>\n")
+        lines.append(f"{self.indent}</Оператор>\n")
+
+        with self.lock:
+            self.file.write(''.join(lines))
+            self.file.flush()
+            self.count += 1
+
+    def write_all(self, results):
+        for result in results:
+            self.write(result)
+
+    def close(self):
+        with self.lock:
+            if self.file:
+                self.file.write('</Операторы>\n')
+                self.file.close()
+                self.file = None
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def excel_styles():
+    """Именованные стили заголовка и ячеек: один стиль на всю книгу вместо объекта на ячейку"""
+    header = NamedStyle(name='pd_header')
+    header.fill = PatternFill(start_color='4F81BD', end_color='4F81BD', fill_type='solid')
+    header.font = Font(color='FFFFFF', bold=True)
+    header.alignment = Alignment(wrap_text=True, vertical='top')
+    header.border = THIN_BORDER
+
+    cell = NamedStyle(name='pd_cell')
+    cell.alignment = Alignment(wrap_text=True, vertical='top')
+    cell.border = THIN_BORDER
+    return header, cell
+
+
+def column_widths(df, max_width=50):
+    """Ширина столбцов по самой длинной строке, считается по столбцам DataFrame целиком"""
+    lengths = df.astype(str).apply(lambda column: column.str.len().max()) if len(df) else None
+    widths = []
+    for column in df.columns:
+        length = len(str(column))
+        if lengths is not None:
+            length = max(length, int(lengths[column]))
+        widths.append(min(length + 2, max_width))
+    return widths
+
+
+@METRICS.timer('report.excel.write')
+def write_excel_report(df, filename, sheet_name='Операторы', status_column=None, max_width=50):
+    """Запись DataFrame в XLSX в потоковом (write-only) режиме openpyxl.
+
+    Строки уходят в файл по мере записи, стили общие для всех ячеек,
+    заливка столбца статуса - правило условного форматирования.
+    """
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet(sheet_name)
+    header_style, cell_style = excel_styles()
+    workbook.add_named_style(header_style)
+    workbook.add_named_style(cell_style)
+
+    # В потоковом режиме ширину и закрепление нужно задать до первой строки
+    for idx, width in enumerate(column_widths(df, max_width), start=1):
+        worksheet.column_dimensions[get_column_letter(idx)].width = width
+    worksheet.freeze_panes = 'A2'
+
+    def styled_row(values, style):
+        row = []
+        for value in values:
+            cell = WriteOnlyCell(worksheet, value=value)
+            cell.style = style
+            row.append(cell)
+        return row
+
+    worksheet.append(styled_row(df.columns, 'pd_header'))
+    values = df.astype(object).where(df.notna(), None)
+    for record in values.itertuples(index=False, name=None):
+        worksheet.append(styled_row(record, 'pd_cell'))
+
+    last_row = len(df) + 1
+    last_column = get_column_letter(max(1, len(df.columns)))
+    if status_column is not None and len(df):
+        letter = get_column_letter(df.columns.get_loc(status_column) + 1)
+        cells = f"{letter}2:{letter}{last_row}"
+        worksheet.conditional_formatting.add(
+            cells, CellIsRule(operator='equal', formula=['"Найден"'], fill=FOUND_FILL))
+        worksheet.conditional_formatting.add(
+            cells, CellIsRule(operator='notEqual', formula=['"Найден"'], fill=NOT_FOUND_FILL))
+
+    # Добавляем фильтры
+    worksheet.auto_filter.ref = f"A1:{last_column}{last_row}"
+    workbook.save(filename)
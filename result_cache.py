@@ -0,0 +1,202 @@
+"""Локальный кэш результатов проверки в SQLite"""
+import json
+import sqlite3
+import threading
+import time
+
+DEFAULT_CACHE_PATH = 'pd_cache.sqlite3'
+
+DETAIL_FIELDS = ('responsible_person', 'contact_details', 'email')
+
+
+class ResultCache:
+    """Кэш результатов по ИНН и карточек оператора по регистрационному номеру.
+
+    ttl - срок жизни найденных записей, negative_ttl - записей "не найден",
+    max_entries - предельное количество записей в каждой таблице; при
+    превышении удаляются записи, к которым дольше всего не обращались.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl=7 * 24 * 3600,
+                 negative_ttl=24 * 3600, max_entries=100000):
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.writes = 0
+        self.reset_stats()
+
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        with self.conn:
+            self.conn.execute('''CREATE TABLE IF NOT EXISTS results (
+                inn TEXT PRIMARY KEY,
+                data TEXT,
+                expires REAL NOT NULL,
+                accessed REAL NOT NULL)''')
+            self.conn.execute('''CREATE TABLE IF NOT EXISTS details (
+                reg_number TEXT PRIMARY KEY,
+                data TEXT NOT NULL,
+                expires REAL NOT NULL,
+                accessed REAL NOT NULL)''')
+            self.conn.execute('CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)')
+            self.conn.execute('CREATE INDEX IF NOT EXISTS details_accessed ON details (accessed)')
+        self.purge_expired()
+
+    def lookup(self, inn):
+        """Возвращает (True, data) при попадании в кэш и (False, None) при промахе.
+
+        data равно None для закэшированного результата "не найден".
+        """
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute(
+                'SELECT data FROM results WHERE inn = ? AND expires > ?', (inn, now)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return False, None
+            self.hits += 1
+            with self.conn:
+                self.conn.execute('UPDATE results SET accessed = ? WHERE inn = ?', (now, inn))
+        return True, json.loads(row[0]) if row[0] is not None else None
+
+    def store(self, inn, data):
+        now = time.time()
+        ttl = self.ttl if data else self.negative_ttl
+        payload = json.dumps(data, ensure_ascii=False) if data else None
+        with self.lock, self.conn:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO results (inn, data, expires, accessed) VALUES (?, ?, ?, ?)',
+                (inn, payload, now + ttl, now)
+            )
+        # Карточку кэшируем только если ее удалось загрузить
+        if (data and data.get('reg_number') and has_details(data)
+                and data['responsible_person'] != 'Не указано'):
+            self.store_details(data['reg_number'], data)
+        self.after_write()
+
+    def lookup_details(self, reg_number):
+        """Данные карточки оператора по регистрационному номеру или None"""
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute(
+                'SELECT data FROM details WHERE reg_number = ? AND expires > ?', (reg_number, now)
+            ).fetchone()
+            if row is None:
+                self.detail_misses += 1
+                return None
+            self.detail_hits += 1
+            with self.conn:
+                self.conn.execute('UPDATE details SET accessed = ? WHERE reg_number = ?', (now, reg_number))
+        return json.loads(row[0])
+
+    def store_details(self, reg_number, data):
+        now = time.time()
+        details = {field: data.get(field, '') for field in DETAIL_FIELDS}
+        with self.lock, self.conn:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO details (reg_number, data, expires, accessed) VALUES (?, ?, ?, ?)',
+                (reg_number, json.dumps(details, ensure_ascii=False), now + self.ttl, now)
+            )
+
+    def after_write(self):
+        # Вытеснение проверяется не на каждой записи, а раз в 100
+        with self.lock:
+            self.writes += 1
+            if self.writes % 100:
+                return
+        self.evict()
+
+    def evict(self):
+        """Удаляет самые давно использованные записи сверх max_entries"""
+        with self.lock, self.conn:
+            for table, key in (('results', 'inn'), ('details', 'reg_number')):
+                count = self.conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+                excess = count - self.max_entries
+                if excess > 0:
+                    self.conn.execute(
+                        f'DELETE FROM {table} WHERE {key} IN '
+                        f'(SELECT {key} FROM {table} ORDER BY accessed LIMIT ?)',
+                        (excess,)
+                    )
+
+    def purge_expired(self):
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.execute('DELETE FROM results WHERE expires <= ?', (now,))
+            self.conn.execute('DELETE FROM details WHERE expires <= ?', (now,))
+        self.evict()
+
+    def reset_stats(self):
+        """Обнуляет счетчики попаданий и промахов перед новым запуском"""
+        self.hits = 0
+        self.misses = 0
+        self.detail_hits = 0
+        self.detail_misses = 0
+
+    def summary(self):
+        return (f"Кэш: попаданий {self.hits}, промахов {self.misses}; "
+                f"карточки: попаданий {self.detail_hits}, промахов {self.detail_misses}")
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+class CachedEngine:
+    """Обертка движка: сначала кэш, сеть - только при промахе или истечении срока"""
+
+    def __init__(self, engine, cache):
+        self.engine = engine
+        self.cache = cache
+        self.name = engine.name
+
+    def search(self, inn):
+        hit, data = self.cache.lookup(inn)
+        if hit:
+            print(f"ИНН {inn} взят из кэша")
+            return data
+        data = self.engine.search(inn)
+        self.cache.store(inn, data)
+        return data
+
+    def fetch_details(self, inn, result):
+        if has_details(result):
+            return result
+        details = self.cache.lookup_details(result['reg_number'])
+        if details:
+            print(f"Карточка {result['reg_number']} взята из кэша")
+            result.update(details)
+        else:
+            result = self.engine.fetch_details(inn, result)
+        self.cache.store(inn, result)
+        return result
+
+    def check(self, inn):
+        result = self.search(inn)
+        return self.fetch_details(inn, result) if result else None
+
+    def close(self):
+        self.engine.close()
+
+
+def has_details(data):
+    """Есть ли в результате данные карточки оператора"""
+    return all(field in data for field in DETAIL_FIELDS)
+
+
+def fill_details_from_cache(results, cache):
+    """Дополняет найденные результаты без данных карточки из кэша карточек"""
+    if cache is None:
+        return results
+    for result in results:
+        data = result.get('data')
+        if not data or not data.get('reg_number'):
+            continue
+        if has_details(data):
+            continue
+        details = cache.lookup_details(data['reg_number'])
+        if details:
+            data.update(details)
+    return results
@@ -0,0 +1,171 @@
+"""Таблица результатов на ttk.Treeview с виртуальной прокруткой"""
+import bisect
+import re
+import tkinter as tk
+from tkinter import ttk
+
+DATE_PATTERN = re.compile(r'^(\d{2})\.(\d{2})\.(\d{4})$')
+
+
+def sort_key(value):
+    """Ключ сортировки ячейки: даты ДД.ММ.ГГГГ - по дате, остальное - без учета регистра"""
+    text = str(value)
+    match = DATE_PATTERN.match(text)
+    if match:
+        day, month, year = match.groups()
+        return f"{year}{month}{day}"
+    return text.lower()
+
+
+class ResultsView(ttk.Frame):
+    """Таблица результатов, в которой Treeview содержит только видимые строки.
+
+    Все строки хранятся в списке кортежей, а в виджет при прокрутке
+    подставляются значения текущей страницы, поэтому скорость отрисовки не
+    зависит от числа строк. Сортировка - щелчком по заголовку столбца;
+    новые строки при сортировке встают на место через bisect.
+    """
+
+    def __init__(self, parent, columns, widths=None):
+        super().__init__(parent)
+        self.columns = list(columns)
+        self.rows = []
+        # Порядок показа: индексы строк и их ключи (при сортировке - по возрастанию)
+        self.order = []
+        self.keys = None
+        self.sort_column = None
+        self.sort_reverse = False
+        self.offset = 0
+        self.page_size = 1
+        self.refresh_pending = False
+
+        self.tree = ttk.Treeview(self, columns=self.columns, show='headings', selectmode='browse')
+        for idx, column in enumerate(self.columns):
+            self.tree.heading(column, text=column, command=lambda c=idx: self.sort_by(c))
+            width = widths[idx] if widths else 120
+            self.tree.column(column, width=width, minwidth=40, stretch=False)
+
+        self.scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self.on_scrollbar)
+        hscroll = ttk.Scrollbar(self, orient=tk.HORIZONTAL, command=self.tree.xview)
+        self.tree.configure(xscrollcommand=hscroll.set)
+        self.count_label = ttk.Label(self, text="Строк: 0")
+
+        self.count_label.pack(side=tk.BOTTOM, anchor=tk.W)
+        hscroll.pack(side=tk.BOTTOM, fill=tk.X)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        self.tree.bind('<Configure>', self.on_resize)
+        self.tree.bind('<MouseWheel>', lambda e: self.scroll(-1 if e.delta > 0 else 1, 'units'))
+        self.tree.bind('<Button-4>', lambda e: self.scroll(-1, 'units'))
+        self.tree.bind('<Button-5>', lambda e: self.scroll(1, 'units'))
+        self.tree.bind('<Prior>', lambda e: self.scroll(-1, 'pages'))
+        self.tree.bind('<Next>', lambda e: self.scroll(1, 'pages'))
+
+    # Данные
+
+    def set_rows(self, rows):
+        """Полная замена содержимого (например, после упорядочивания результатов)"""
+        self.rows = [tuple(row) for row in rows]
+        self.rebuild_order()
+        self.offset = 0
+        self.schedule_refresh()
+
+    def append(self, row):
+        """Добавление строки по мере проверки ИНН"""
+        at_end = self.offset + self.page_size >= len(self.order)
+        index = len(self.rows)
+        self.rows.append(tuple(row))
+        if self.keys is None:
+            self.order.append(index)
+            # В исходном порядке таблица следует за новыми строками, если была внизу
+            if at_end:
+                self.offset = max(0, len(self.order) - self.page_size)
+        else:
+            key = sort_key(self.rows[index][self.sort_column])
+            position = bisect.bisect_right(self.keys, key)
+            self.keys.insert(position, key)
+            self.order.insert(position, index)
+        self.schedule_refresh()
+
+    def clear(self):
+        self.set_rows([])
+
+    def sort_by(self, column):
+        if self.sort_column == column:
+            self.sort_reverse = not self.sort_reverse
+        else:
+            self.sort_column = column
+            self.sort_reverse = False
+        self.rebuild_order()
+        self.offset = 0
+        for idx, name in enumerate(self.columns):
+            arrow = (' ▼' if self.sort_reverse else ' ▲') if idx == column else ''
+            self.tree.heading(name, text=name + arrow)
+        self.schedule_refresh()
+
+    def rebuild_order(self):
+        if self.sort_column is None:
+            self.order = list(range(len(self.rows)))
+            self.keys = None
+            return
+        keyed = sorted((sort_key(row[self.sort_column]), index) for index, row in enumerate(self.rows))
+        self.keys = [key for key, _ in keyed]
+        self.order = [index for _, index in keyed]
+
+    def row_at(self, position):
+        """Строка на позиции показа с учетом направления сортировки"""
+        if self.sort_reverse:
+            position = len(self.order) - 1 - position
+        return self.rows[self.order[position]]
+
+    # Отрисовка
+
+    def schedule_refresh(self):
+        # Пачка добавлений за один проход цикла Tk дает одну перерисовку
+        if not self.refresh_pending:
+            self.refresh_pending = True
+            self.after_idle(self.refresh)
+
+    def on_resize(self, event):
+        row_height = ttk.Style().lookup('Treeview', 'rowheight') or 20
+        self.page_size = max(1, (event.height - 25) // int(row_height))
+        self.schedule_refresh()
+
+    def refresh(self):
+        self.refresh_pending = False
+        total = len(self.order)
+        self.offset = max(0, min(self.offset, total - self.page_size))
+        end = min(total, self.offset + self.page_size)
+
+        items = self.tree.get_children()
+        needed = end - self.offset
+        if len(items) > needed:
+            self.tree.delete(*items[needed:])
+            items = items[:needed]
+        for position in range(self.offset, end):
+            slot = position - self.offset
+            values = self.row_at(position)
+            if slot < len(items):
+                self.tree.item(items[slot], values=values)
+            else:
+                self.tree.insert('', tk.END, values=values)
+
+        if total:
+            self.scrollbar.set(self.offset / total, end / total)
+        else:
+            self.scrollbar.set(0, 1)
+        self.count_label.configure(text=f"Строк: {total}")
+
+    def scroll(self, amount, what):
+        step = self.page_size if what == 'pages' else 1
+        self.offset += int(amount) * step
+        self.schedule_refresh()
+        return 'break'
+
+    def on_scrollbar(self, action, *args):
+        if action == 'moveto':
+            self.offset = int(float(args[0]) * len(self.order))
+            self.schedule_refresh()
+        elif action == 'scroll':
+            self.scroll(args[0], args[1])
@@ -0,0 +1,39 @@
+"""Повтор проверки при временных сбоях: таймауты, упавший браузер, ответы 5xx"""
+import random
+import threading
+
+
+class TransientError(Exception):
+    """Временный сбой проверки: ИНН не удалось проверить, но повтор может помочь.
+
+    Отличается от "не найден": движок возвращает None только для пустой
+    таблицы результатов, а сбой поднимает это исключение с причиной.
+    """
+
+
+class RetryPolicy:
+    """Повтор с экспоненциально растущей паузой и случайным разбросом.
+
+    Пауза перед повтором n (с 1) - случайная в пределах
+    base_delay * 2^(n-1) * (1 ± jitter), но не больше max_delay.
+    """
+
+    def __init__(self, attempts=3, base_delay=2.0, max_delay=60.0, jitter=0.5):
+        self.attempts = max(1, int(attempts))
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.random = random.Random()
+        self.lock = threading.Lock()
+
+    def delay(self, attempt):
+        """Пауза в секундах перед повтором после неудачной попытки attempt"""
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        with self.lock:
+            spread = self.random.uniform(-self.jitter, self.jitter)
+        return max(0.0, delay * (1 + spread))
+
+
+def error_result(inn, error):
+    """Результат для ИНН, который не удалось проверить после всех повторов"""
+    return {'inn': inn, 'data': None, 'status': 'error', 'error': str(error)}
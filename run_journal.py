@@ -0,0 +1,98 @@
+"""Журнал завершенных ИНН для продолжения прерванной проверки"""
+import csv
+import json
+import os
+import threading
+
+
+def journal_path_for(input_file):
+    """Журнал лежит рядом с входным файлом: inn.txt -> inn.txt.journal.jsonl"""
+    return f"{input_file}.journal.jsonl"
+
+
+def failed_path_for(input_file):
+    """Список непроверенных ИНН рядом с входным файлом: inn.txt -> inn.txt.failed.csv"""
+    return f"{input_file}.failed.csv"
+
+
+def write_failed_list(path, results):
+    """Записывает ИНН с ошибкой проверки для повторного запуска только по ним.
+
+    Файл - CSV со столбцами ИНН и Ошибка, его можно сразу выбрать входным
+    файлом. Если ошибок нет, прежний список удаляется. Возвращает число ИНН.
+    """
+    # Повторяющиеся ИНН входного файла попадают в список один раз
+    failed = {result['inn']: result for result in results if result.get('status') == 'error'}
+    if not failed:
+        if os.path.exists(path):
+            os.remove(path)
+        return 0
+    with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.writer(f, delimiter=';')
+        writer.writerow(['ИНН', 'Ошибка'])
+        for result in failed.values():
+            writer.writerow([result['inn'], result.get('error', '')])
+    return len(failed)
+
+
+class RunJournal:
+    """Append-only журнал в формате JSONL: одна строка на каждый завершенный ИНН"""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.file = None
+
+    def load(self):
+        """Читает журнал и возвращает словарь ИНН -> результат.
+
+        ИНН с ошибкой проверки не считаются завершенными и проверяются заново.
+        """
+        done = {}
+        if not os.path.exists(self.path):
+            return done
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    result = json.loads(line)
+                except json.JSONDecodeError:
+                    # Последняя строка могла оборваться при аварийном завершении
+                    continue
+                if result.get('status') == 'error':
+                    done.pop(result['inn'], None)
+                    continue
+                done[result['inn']] = result
+        return done
+
+    def open(self, resume=True):
+        """Открывает журнал на дозапись; без resume старый журнал очищается"""
+        with self.lock:
+            self.file = open(self.path, 'a' if resume else 'w', encoding='utf-8')
+            # Оборванную последнюю строку отделяем, чтобы не испортить новую запись
+            if resume and self.file.tell() > 0:
+                with open(self.path, 'rb') as f:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b'\n':
+                        self.file.write('\n')
+        return self
+
+    def append(self, result):
+        line = json.dumps(result, ensure_ascii=False)
+        with self.lock:
+            self.file.write(line + '\n')
+            self.file.flush()
+
+    def close(self):
+        with self.lock:
+            if self.file:
+                self.file.close()
+                self.file = None
+
+    def remove(self):
+        """Удаляет журнал после успешного завершения всей проверки"""
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,116 @@
+"""Текущая статистика проверки, накапливаемая по мере поступления результатов"""
+import threading
+import time
+from collections import Counter
+from reports import result_status
+
+
+def registration_year(data):
+    """Год из даты регистрации ДД.ММ.ГГГГ или None"""
+    date = (data.get('registration_date') or '').strip()
+    year = date[-4:]
+    return year if len(date) == 10 and year.isdigit() else None
+
+
+class RunStats:
+    """Счетчики найденных / не найденных / ошибок, по типу оператора и году
+    регистрации, а также скорость проверки и оценка оставшегося времени.
+
+    Каждый результат учитывается один раз в add(), поэтому снимок для окна
+    статистики не требует пересчета по всем результатам.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self, total=None):
+        with self.lock:
+            self.total = total
+            self.started_at = time.monotonic()
+            self.finished_at = None
+            self.completed = 0
+            # Результаты этого запуска (без взятых из журнала) - для расчета скорости
+            self.checked = 0
+            self.statuses = Counter()
+            self.types = Counter()
+            self.years = Counter()
+
+    def add(self, result, checked=True):
+        """checked=False - результат взят из журнала, в скорости не учитывается"""
+        status = result_status(result)
+        data = result['data'] or {}
+        with self.lock:
+            self.completed += 1
+            if checked:
+                self.checked += 1
+            self.statuses[status] += 1
+            if status == 'found':
+                self.types[data.get('operator_type') or 'Не указан'] += 1
+                self.years[registration_year(data) or 'Не указан'] += 1
+
+    def finish(self):
+        """Останавливает часы: скорость после окончания проверки не падает"""
+        with self.lock:
+            self.finished_at = time.monotonic()
+
+    def add_all(self, results, checked=False):
+        for result in results:
+            self.add(result, checked)
+
+    def snapshot(self):
+        """Копия счетчиков с производными величинами: скорость (ИНН/мин) и ETA (с)"""
+        with self.lock:
+            elapsed = (self.finished_at or time.monotonic()) - self.started_at
+            rate = self.checked / elapsed * 60 if elapsed > 0 else 0.0
+            remaining = self.total - self.completed if self.total is not None else None
+            eta = remaining / rate * 60 if remaining is not None and rate > 0 else None
+            return {
+                'total': self.total,
+                'completed': self.completed,
+                'found': self.statuses['found'],
+                'not_found': self.statuses['not_found'],
+                'errors': self.statuses['error'],
+                'invalid': self.statuses['invalid'],
+                'types': dict(self.types),
+                'years': dict(self.years),
+                'elapsed': elapsed,
+                'per_minute': rate,
+                'eta': eta
+            }
+
+
+def format_duration(seconds):
+    seconds = int(seconds)
+    return f"{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
+def format_stats(stats, top=10):
+    """Текст для окна статистики"""
+    completed = stats['completed']
+
+    def share(count):
+        return f"{count} ({count / completed * 100:.1f}%)" if completed else "0"
+
+    total = stats['total'] if stats['total'] is not None else '?'
+    lines = [
+        "Общая статистика:",
+        "=" * 40,
+        f"Проверено: {completed} из {total}",
+        f"Найдено: {share(stats['found'])}",
+        f"Не найдено: {share(stats['not_found'])}",
+        f"Ошибок: {share(stats['errors'])}",
+        f"Некорректных ИНН: {share(stats['invalid'])}",
+        f"Скорость: {stats['per_minute']:.1f} ИНН/мин",
+        f"Прошло: {format_duration(stats['elapsed'])}",
+        f"Осталось: {format_duration(stats['eta']) if stats['eta'] is not None else '-'}",
+        "",
+        "Топ операторов по типу:",
+        "=" * 40
+    ]
+    for type_name, count in sorted(stats['types'].items(), key=lambda item: -item[1])[:top]:
+        lines.append(f"{type_name}: {count}")
+    lines += ["", "По году регистрации:", "=" * 40]
+    for year, count in sorted(stats['years'].items()):
+        lines.append(f"{year}: {count}")
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,91 @@
+"""Инкрементальный поисковый индекс по результатам проверки"""
+import threading
+from array import array
+
+
+# Короче триграммы индекс не сужает перебор: такой запрос ищется только как точный ключ
+MIN_QUERY_LENGTH = 3
+
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class SearchIndex:
+    """Поиск по результатам без перебора DataFrame.
+
+    Для каждой записи хранится строка поиска в нижнем регистре, точные
+    словари ИНН и регистрационных номеров и триграммный индекс: по запросу
+    от трех символов кандидаты берутся из самого короткого списка триграмм
+    запроса и только они проверяются поиском подстроки. Записи добавляются
+    по одной по мере проверки ИНН.
+    """
+
+    def __init__(self, fields):
+        # fields - функция result -> список строк, по которым идет поиск
+        self.fields = fields
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self.lock:
+            self.results = []
+            self.haystacks = []
+            self.exact = {}
+            self.postings = {}
+
+    def add(self, result):
+        values = [str(value) for value in self.fields(result) if value]
+        haystack = '\n'.join(values).lower()
+        keys = {result['inn']}
+        if result['data'] and result['data'].get('reg_number'):
+            keys.add(result['data']['reg_number'].lower())
+
+        with self.lock:
+            position = len(self.results)
+            self.results.append(result)
+            self.haystacks.append(haystack)
+            for key in keys:
+                self.exact.setdefault(key, []).append(position)
+            for gram in trigrams(haystack):
+                postings = self.postings.get(gram)
+                if postings is None:
+                    postings = self.postings[gram] = array('i')
+                postings.append(position)
+
+    def rebuild(self, results):
+        self.clear()
+        for result in results:
+            self.add(result)
+
+    def __len__(self):
+        return len(self.results)
+
+    def search(self, query, limit=200):
+        """Результаты, содержащие query (без учета регистра), не более limit.
+
+        Точное совпадение ИНН или регистрационного номера идет первым.
+        Перебор останавливается на limit-м совпадении, поэтому частые
+        запросы ("ооо") обходятся так же дешево, как редкие. Запрос короче
+        MIN_QUERY_LENGTH символов дает только точные совпадения ключа:
+        иначе пришлось бы перебирать все записи.
+        """
+        query = query.strip().lower()
+        if not query:
+            return []
+
+        with self.lock:
+            found = list(self.exact.get(query, []))[:limit]
+            if len(query) < MIN_QUERY_LENGTH:
+                return [self.results[position] for position in found]
+            grams = trigrams(query)
+            candidates = min((self.postings.get(gram, ()) for gram in grams), key=len)
+
+            seen = set(found)
+            haystacks = self.haystacks
+            for position in candidates:
+                if len(found) >= limit:
+                    break
+                if query in haystacks[position] and position not in seen:
+                    found.append(position)
+            return [self.results[position] for position in found]
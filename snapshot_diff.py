@@ -0,0 +1,262 @@
+"""Повторная проверка относительно прошлого отчета: карточки только для изменившихся операторов"""
+import csv
+import datetime
+import json
+import os
+from xml.etree.ElementTree import iterparse
+import pandas as pd
+from registry_parser import extract_email
+from reports import split_name_inn, result_status, write_excel_report
+from result_cache import DETAIL_FIELDS, has_details
+from metrics import METRICS
+
+# Поля, по которым сравнивается оператор: ключ данных -> подпись в отчете об изменениях
+COMPARED_FIELDS = [
+    ('reg_number', 'Регистрационный номер'),
+    ('name', 'Наименование'),
+    ('operator_type', 'Тип оператора'),
+    ('inclusion_basis', 'Основание включения'),
+    ('registration_date', 'Дата регистрации'),
+    ('processing_start_date', 'Дата начала обработки'),
+    ('responsible_person', 'Ответственное лицо'),
+    ('contact_details', 'Контактные данные'),
+    ('email', 'Email')
+]
+
+# Теги XML-отчета и столбцы Excel-отчета -> ключи данных результата
+XML_FIELDS = {
+    'Регистрационный_номер': 'reg_number',
+    'Наименование': 'name',
+    'ИНН': 'inn',
+    'Тип_оператора': 'operator_type',
+    'Основание_включения': 'inclusion_basis',
+    'Дата_регистрации': 'registration_date',
+    'Дата_начала_обработки': 'processing_start_date',
+    'Ссылка_на_карточку': 'url',
+    'Ответственное_лицо': 'responsible_person',
+    'Контактные_данные': 'contact_details',
+    'Статус': 'status'
+}
+EXCEL_FIELDS = {
+    'ИНН': 'inn',
+    'Статус': 'status',
+    'Регистрационный номер': 'reg_number',
+    'Наименование': 'name',
+    'Тип оператора': 'operator_type',
+    'Основание включения': 'inclusion_basis',
+    'Дата регистрации': 'registration_date',
+    'Дата начала обработки': 'processing_start_date',
+    'Ответственное лицо': 'responsible_person',
+    'Контактные данные': 'contact_details',
+    'Email': 'email',
+    'Ссылка на карточку': 'url'
+}
+
+# Статусы прошлого отчета, по которым нельзя судить о наличии в реестре
+UNKNOWN_STATUS_PREFIXES = ('Некорректный ИНН', 'Ошибка проверки')
+# Так отчеты заполняют поля карточки, которую не загружали: карточку нужно открыть
+MISSING_DETAIL = 'Не указано'
+
+CHANGE_NEW = 'Новый'
+CHANGE_REMOVED = 'Исключен из реестра'
+CHANGE_CHANGED = 'Изменен'
+CHANGE_COLUMNS = ['ИНН', 'Изменение', 'Поле', 'Было', 'Стало']
+
+
+def row_to_data(row):
+    """Данные результата из плоской строки отчета или None для "не найден".
+
+    Возвращает (ИНН, данные); ИНН None - строка не годится для сравнения.
+    """
+    status = str(row.get('status') or '')
+    if status.startswith(UNKNOWN_STATUS_PREFIXES):
+        return None, None
+    inn = str(row.get('inn') or '').strip()
+    if not row.get('reg_number'):
+        return inn or None, None
+    data = {
+        'reg_number': str(row['reg_number']).strip(),
+        'name_inn': f"{str(row.get('name') or '').strip()} ИНН: {inn}",
+        'url': row.get('url') or ''
+    }
+    for field, _ in COMPARED_FIELDS:
+        value = row.get(field)
+        if field in ('reg_number', 'name') or value is None:
+            continue
+        if field in DETAIL_FIELDS and str(value).strip() == MISSING_DETAIL:
+            continue
+        data[field] = str(value).strip()
+    # В XML-отчете нет отдельного email - он берется из контактов, как в карточке
+    if 'contact_details' in data and 'email' not in data:
+        data['email'] = extract_email(data['contact_details'])
+    return inn, data
+
+
+def iter_xml_rows(path):
+    for _, element in iterparse(path):
+        if element.tag != 'Оператор':
+            continue
+        yield {XML_FIELDS[child.tag]: child.text or '' for child in element if child.tag in XML_FIELDS}
+        element.clear()
+
+
+def iter_excel_rows(path):
+    from openpyxl import load_workbook
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [EXCEL_FIELDS.get(str(name or '').strip()) for name in next(rows, ())]
+        for values in rows:
+            yield {field: value for field, value in zip(header, values) if field and value not in (None, '')}
+    finally:
+        workbook.close()
+
+
+def iter_parquet_rows(path):
+    import pyarrow.parquet as pq
+    # Набор данных с разбиением по дате: более поздние проверки перекрывают ранние
+    table = pq.read_table(path).sort_by('checked_at')
+    for record in table.to_pylist():
+        record['status'] = {'found': 'Найден', 'not_found': ''}.get(record['status'], 'Ошибка проверки')
+        for field in ('registration_date', 'processing_start_date'):
+            if isinstance(record[field], datetime.date):
+                record[field] = record[field].strftime('%d.%m.%Y')
+        yield record
+
+
+def iter_journal_rows(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if result_status(result) in ('found', 'not_found'):
+                data = result['data']
+                name = split_name_inn(data['name_inn'])[0] if data else ''
+                yield dict(data or {}, inn=result['inn'], name=name)
+
+
+def load_snapshot(path):
+    """Прошлый результат по ИНН из report.xml, report.xlsx, Parquet или журнала (JSONL).
+
+    Значение - данные оператора или None, если ИНН не был найден в реестре.
+    """
+    lower = path.lower()
+    if lower.endswith('.xml'):
+        rows = iter_xml_rows(path)
+    elif lower.endswith(('.xlsx', '.xlsm')):
+        rows = iter_excel_rows(path)
+    elif lower.endswith('.parquet') or os.path.isdir(path):
+        rows = iter_parquet_rows(path)
+    elif lower.endswith('.jsonl'):
+        rows = iter_journal_rows(path)
+    else:
+        raise ValueError(f"Неизвестный формат прошлого отчета: {path}")
+    snapshot = {}
+    for row in rows:
+        inn, data = row_to_data(row)
+        if inn:
+            snapshot[inn] = data
+    return snapshot
+
+
+def snapshot_key(data):
+    """Оператор считается неизменным при тех же номере и дате регистрации"""
+    return (str(data.get('reg_number') or '').strip(), str(data.get('registration_date') or '').strip())
+
+
+class SnapshotEngine:
+    """Обертка движка: карточка берется из прошлого отчета, если оператор не изменился.
+
+    Поиск по списку выполняется всегда; при совпадении номера и даты
+    регистрации с прошлым снимком данные карточки переносятся из снимка,
+    и конвейер не открывает карточку.
+    """
+
+    def __init__(self, engine, snapshot):
+        self.engine = engine
+        self.snapshot = snapshot
+        self.name = engine.name
+
+    def search(self, inn):
+        data = self.engine.search(inn)
+        previous = self.snapshot.get(inn)
+        if data and previous and not has_details(data) and has_details(previous) and \
+                snapshot_key(data) == snapshot_key(previous):
+            METRICS.increment('details.unchanged')
+            data.update({field: previous[field] for field in DETAIL_FIELDS})
+        return data
+
+    def fetch_details(self, inn, result):
+        return self.engine.fetch_details(inn, result)
+
+    def check(self, inn):
+        result = self.search(inn)
+        return self.fetch_details(inn, result) if result and not has_details(result) else result
+
+    def close(self):
+        self.engine.close()
+
+
+def comparable(data):
+    name = split_name_inn(data['name_inn'])[0] if data.get('name_inn') else ''
+    return {field: name if field == 'name' else str(data.get(field) or '').strip()
+            for field, _ in COMPARED_FIELDS}
+
+
+def diff_result(snapshot, result):
+    """Строки отчета об изменениях для одного результата (пусто - без изменений).
+
+    ИНН с ошибкой проверки не сравнивается: о нем ничего не известно.
+    """
+    status = result_status(result)
+    if status not in ('found', 'not_found'):
+        return []
+    inn = result['inn']
+    previous = snapshot.get(inn)
+    current = result['data']
+    if current and not previous:
+        return [{'ИНН': inn, 'Изменение': CHANGE_NEW, 'Поле': '', 'Было': '',
+                 'Стало': current.get('reg_number', '')}]
+    if previous and not current:
+        return [{'ИНН': inn, 'Изменение': CHANGE_REMOVED, 'Поле': '',
+                 'Было': previous.get('reg_number', ''), 'Стало': ''}]
+    if not current:
+        return []
+    before, after = comparable(previous), comparable(current)
+    rows = []
+    for field, label in COMPARED_FIELDS:
+        # Поле карточки, которой не было в одном из снимков, не сравнивается
+        if field in DETAIL_FIELDS and (field not in previous or field not in current):
+            continue
+        if before[field] != after[field]:
+            rows.append({'ИНН': inn, 'Изменение': CHANGE_CHANGED, 'Поле': label,
+                         'Было': before[field], 'Стало': after[field]})
+    return rows
+
+
+def diff_results(snapshot, results):
+    rows = []
+    for result in results:
+        rows.extend(diff_result(snapshot, result))
+    return rows
+
+
+def describe_changes(rows):
+    """Краткая сводка: новых, исключенных и измененных операторов"""
+    new = sum(1 for row in rows if row['Изменение'] == CHANGE_NEW)
+    removed = sum(1 for row in rows if row['Изменение'] == CHANGE_REMOVED)
+    changed = len({row['ИНН'] for row in rows if row['Изменение'] == CHANGE_CHANGED})
+    return f"новых: {new}, исключенных: {removed}, измененных: {changed}"
+
+
+def write_changes_report(rows, filename='changes.xlsx'):
+    """Отчет об изменениях: *.xlsx - Excel, иначе CSV с разделителем ";" """
+    if filename.lower().endswith('.xlsx'):
+        write_excel_report(pd.DataFrame(rows, columns=CHANGE_COLUMNS), filename, sheet_name='Изменения')
+        return
+    with open(filename, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=CHANGE_COLUMNS, delimiter=';')
+        writer.writeheader()
+        writer.writerows(rows)
@@ -0,0 +1,180 @@
+"""Общая очередь ИНН в SQLite для распределенной проверки: аренда заданий с тайм-аутом"""
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from retry_policy import error_result
+
+DEFAULT_QUEUE_PATH = 'pd_queue.sqlite3'
+
+# Состояния задания
+PENDING = 'pending'
+LEASED = 'leased'
+DONE = 'done'
+
+
+class WorkQueue:
+    """Очередь заданий (по одному на ИНН) с арендой.
+
+    Воркер берет задания в аренду на lease_seconds и продлевает ее, пока
+    проверяет. Задание с истекшей арендой (воркер упал или потерял связь)
+    выдается другому воркеру; после max_attempts аренд или ошибок проверки
+    оно завершается результатом со статусом error. Готовые результаты
+    складываются в таблицу results, откуда их по порядку забирает координатор.
+
+    Файл очереди может лежать в общем каталоге: воркеры и координатор
+    открывают его каждый своим подключением.
+    """
+
+    def __init__(self, path=DEFAULT_QUEUE_PATH, timeout=30):
+        self.path = path
+        self.lock = threading.Lock()
+        # Транзакции открываются явно (BEGIN IMMEDIATE), чтобы аренда была атомарной
+        self.conn = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        # Режим WAL не включается: он работает только для процессов одной машины,
+        # а файл очереди открывают воркеры с разных машин через общий каталог
+        with self.lock:
+            with self.transaction():
+                self.conn.execute('''CREATE TABLE IF NOT EXISTS items (
+                    inn TEXT PRIMARY KEY,
+                    position INTEGER NOT NULL,
+                    state TEXT NOT NULL,
+                    worker TEXT,
+                    lease_until REAL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    error TEXT)''')
+                self.conn.execute('''CREATE TABLE IF NOT EXISTS results (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    inn TEXT NOT NULL,
+                    worker TEXT,
+                    result TEXT NOT NULL,
+                    finished REAL NOT NULL)''')
+                self.conn.execute('''CREATE TABLE IF NOT EXISTS meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL)''')
+                self.conn.execute('CREATE INDEX IF NOT EXISTS items_state ON items (state, position)')
+
+    @contextmanager
+    def transaction(self):
+        self.conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield
+            self.conn.execute('COMMIT')
+        except BaseException:
+            # COMMIT тоже может не пройти (файл занят): транзакция не должна остаться открытой
+            if self.conn.in_transaction:
+                self.conn.execute('ROLLBACK')
+            raise
+
+    def configure(self, max_attempts=3):
+        """Параметры очереди задает координатор; воркеры читают их из файла"""
+        with self.lock, self.transaction():
+            self.conn.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)',
+                              ('max_attempts', str(int(max_attempts))))
+
+    def max_attempts(self):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'max_attempts'").fetchone()
+        return int(row[0]) if row else 3
+
+    def add(self, inns):
+        """Добавляет ИНН в очередь; уже известные (при продолжении) пропускаются"""
+        with self.lock, self.transaction():
+            start = self.conn.execute('SELECT COALESCE(MAX(position), 0) FROM items').fetchone()[0]
+            self.conn.executemany(
+                'INSERT OR IGNORE INTO items (inn, position, state) VALUES (?, ?, ?)',
+                ((inn, start + index, PENDING) for index, inn in enumerate(inns, start=1)))
+
+    def clear(self):
+        with self.lock, self.transaction():
+            self.conn.execute('DELETE FROM items')
+            self.conn.execute('DELETE FROM results')
+
+    def lease(self, worker, count=1, lease_seconds=300):
+        """Берет в аренду до count заданий: новые и с истекшей арендой, по порядку списка"""
+        now = time.time()
+        with self.lock, self.transaction():
+            max_attempts = self.max_attempts()
+            # Задания, которые воркеры слишком часто бросали, больше не выдаются
+            expired = self.conn.execute(
+                'SELECT inn, attempts FROM items WHERE state = ? AND lease_until < ? AND attempts >= ?',
+                (LEASED, now, max_attempts)).fetchall()
+            for inn, attempts in expired:
+                self.finish_locked(inn, None, error_result(
+                    inn, f"воркер не вернул результат, аренда истекла {attempts} раз"), now)
+
+            rows = self.conn.execute(
+                'SELECT inn FROM items WHERE state = ? OR (state = ? AND lease_until < ?) '
+                'ORDER BY position LIMIT ?',
+                (PENDING, LEASED, now, count)).fetchall()
+            inns = [row[0] for row in rows]
+            self.conn.executemany(
+                'UPDATE items SET state = ?, worker = ?, lease_until = ?, attempts = attempts + 1 WHERE inn = ?',
+                ((LEASED, worker, now + lease_seconds, inn) for inn in inns))
+        return inns
+
+    def heartbeat(self, worker, lease_seconds=300):
+        """Продлевает аренду всех заданий воркера"""
+        with self.lock, self.transaction():
+            self.conn.execute('UPDATE items SET lease_until = ? WHERE state = ? AND worker = ?',
+                              (time.time() + lease_seconds, LEASED, worker))
+
+    def release(self, worker):
+        """Возвращает в очередь задания остановленного воркера, не засчитывая попытку"""
+        with self.lock, self.transaction():
+            self.conn.execute(
+                'UPDATE items SET state = ?, worker = NULL, lease_until = NULL, attempts = attempts - 1 '
+                'WHERE state = ? AND worker = ?', (PENDING, LEASED, worker))
+
+    def complete(self, worker, result):
+        """Принимает результат воркера.
+
+        Результат по уже завершенному заданию (его аренда истекла и задание
+        проверил другой воркер) отбрасывается. Ошибка проверки возвращает
+        задание в очередь, пока не исчерпаны попытки: другой воркер может
+        проверить ИНН с другого адреса.
+        """
+        inn = result['inn']
+        with self.lock, self.transaction():
+            row = self.conn.execute('SELECT state, attempts FROM items WHERE inn = ?', (inn,)).fetchone()
+            if row is None or row[0] == DONE:
+                return False
+            if result.get('status') == 'error' and row[1] < self.max_attempts():
+                self.conn.execute(
+                    'UPDATE items SET state = ?, worker = NULL, lease_until = NULL, error = ? WHERE inn = ?',
+                    (PENDING, result.get('error'), inn))
+                return False
+            self.finish_locked(inn, worker, result, time.time())
+        return True
+
+    def finish_locked(self, inn, worker, result, now):
+        self.conn.execute('UPDATE items SET state = ?, worker = ?, lease_until = NULL WHERE inn = ?',
+                          (DONE, worker, inn))
+        self.conn.execute('INSERT INTO results (inn, worker, result, finished) VALUES (?, ?, ?, ?)',
+                          (inn, worker, json.dumps(result, ensure_ascii=False), now))
+
+    def results_after(self, last_id=0, limit=1000):
+        """Готовые результаты после last_id: список (id, воркер, результат) по порядку поступления"""
+        with self.lock:
+            rows = self.conn.execute(
+                'SELECT id, worker, result FROM results WHERE id > ? ORDER BY id LIMIT ?',
+                (last_id, limit)).fetchall()
+        return [(row_id, worker, json.loads(result)) for row_id, worker, result in rows]
+
+    def counts(self):
+        """Количество заданий по состояниям и общее"""
+        with self.lock:
+            rows = self.conn.execute('SELECT state, COUNT(*) FROM items GROUP BY state').fetchall()
+        counts = {PENDING: 0, LEASED: 0, DONE: 0}
+        counts.update(rows)
+        counts['total'] = sum(count for _, count in rows)
+        return counts
+
+    def finished(self):
+        """Все задания завершены (в непустой очереди)"""
+        counts = self.counts()
+        return counts['total'] > 0 and counts[DONE] == counts['total']
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
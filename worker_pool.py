@@ -0,0 +1,297 @@
+"""Параллельная проверка ИНН пулом движков с общей очередью заданий"""
+import queue
+import threading
+from rate_limiter import RATE_LIMITER
+from metrics import METRICS
+from result_cache import has_details
+from retry_policy import RetryPolicy, TransientError, error_result
+
+
+# Режимы второго этапа (загрузки карточки оператора)
+DETAILS_ALL = 'all'      # карточка загружается для каждого найденного ИНН
+DETAILS_NONE = 'none'    # только проверка наличия в реестре
+DETAILS_LAZY = 'lazy'    # карточка только по запросу, через fetch_missing_details
+
+DETAILS_MODES = (DETAILS_ALL, DETAILS_NONE, DETAILS_LAZY)
+
+
+class TaskSource:
+    """Потокобезопасная выдача заданий из списка или потока (например, stdin)"""
+
+    def __init__(self, tasks):
+        self.tasks = iter(tasks)
+        self.lock = threading.Lock()
+
+    def get(self):
+        with self.lock:
+            return next(self.tasks, None)
+
+
+class TwoStagePipeline:
+    """Конвейер из двух этапов, связанных очередью.
+
+    Первый этап ищет ИНН в списке операторов (номер, наименование, даты,
+    ссылка), второй загружает карточку (ответственный, контакты). У каждого
+    этапа свое число потоков и свой лимит запросов. engine_factory получает
+    ограничитель частоты этапа и возвращает новый движок.
+
+    Временные сбои (TransientError) повторяются по retry; ИНН, который так
+    и не удалось найти, завершается результатом со статусом error, а
+    найденный без загруженной карточки - результатом без данных карточки.
+    Ошибка вне проверки ИНН (чтение входного потока, обработчик on_result)
+    останавливает конвейер и поднимается из run/run_stream.
+    """
+
+    def __init__(self, engine_factory, search_workers=1, detail_workers=1,
+                 details=DETAILS_ALL, on_result=None,
+                 search_limiter=RATE_LIMITER, detail_limiter=RATE_LIMITER, retry=None):
+        if details not in DETAILS_MODES:
+            raise ValueError(f"Неизвестный режим карточек: {details}")
+        self.engine_factory = engine_factory
+        self.search_workers = max(1, int(search_workers))
+        self.detail_workers = max(1, int(detail_workers))
+        self.details = details
+        self.on_result = on_result
+        self.search_limiter = search_limiter
+        self.detail_limiter = detail_limiter
+        self.retry = retry or RetryPolicy()
+        self.stop_event = threading.Event()
+        self.lock = threading.Lock()
+        self.engines = []
+        self.detail_threads = []
+        self.detail_queue = None
+        self.results = {}
+        self.keep_results = True
+        self.completed = 0
+        self.total = 0
+        self.started = {'search': 0, 'detail': 0}
+        self.startup_errors = {'search': [], 'detail': []}
+        self.error = None
+
+    @property
+    def workers(self):
+        return self.search_workers
+
+    def uses_details(self):
+        """Загружать ли карточки сразу при проверке (в режиме lazy - только по запросу)"""
+        return self.details == DETAILS_ALL
+
+    def run(self, inn_list):
+        """Проверяет список ИНН и возвращает результаты в исходном порядке"""
+        self.keep_results = True
+        self.execute(len(inn_list), list(enumerate(inn_list)), [], self.uses_details())
+        self.check_startup()
+        return self.ordered_results()
+
+    def run_stream(self, inns):
+        """Проверяет ИНН по мере чтения из итератора, не накапливая результаты.
+
+        Результаты передаются только в on_result (total = None), поэтому
+        память не зависит от длины входного потока.
+        """
+        self.keep_results = False
+        self.execute(None, enumerate(inns), [], self.uses_details())
+        self.check_startup()
+
+    def check_startup(self):
+        if self.started['search'] == 0 and self.startup_errors['search']:
+            raise RuntimeError(f"Не удалось запустить ни одного движка: {self.startup_errors['search'][0]}")
+
+    def ordered_results(self):
+        return [self.results[index] for index in sorted(self.results)]
+
+    def fetch_missing_details(self, results):
+        """Догружает карточки для найденных результатов, у которых их еще нет"""
+        detail_tasks = [
+            (index, result['inn'], result['data'])
+            for index, result in enumerate(results)
+            if result['data'] and not has_details(result['data'])
+        ]
+        if not detail_tasks:
+            return list(results)
+        self.keep_results = True
+        self.execute(len(results), [], detail_tasks, True, dict(enumerate(results)))
+        return self.ordered_results()
+
+    def execute(self, total, search_tasks, detail_tasks, use_details, results=None):
+        """search_tasks - список или итератор пар (индекс, ИНН); total = None для потока"""
+        self.stop_event.clear()
+        self.error = None
+        self.total = total
+        self.results = results if results is not None else {}
+        self.completed = total - len(search_tasks) - len(detail_tasks) if total is not None else 0
+        self.started = {'search': 0, 'detail': 0}
+        self.startup_errors = {'search': [], 'detail': []}
+
+        source = TaskSource(search_tasks)
+        self.detail_queue = queue.Queue()
+        for task in detail_tasks:
+            self.detail_queue.put(task)
+
+        search_count = self.search_workers
+        if isinstance(search_tasks, list):
+            search_count = min(search_count, len(search_tasks))
+        search_threads = [
+            threading.Thread(target=self.search_worker, args=(source,),
+                             name=f"pd-search-{i + 1}", daemon=True)
+            for i in range(search_count)
+        ]
+        self.detail_threads = []
+        if use_details:
+            self.detail_threads = [
+                threading.Thread(target=self.detail_worker,
+                                 name=f"pd-detail-{i + 1}", daemon=True)
+                for i in range(self.detail_workers)
+            ]
+
+        for thread in search_threads + self.detail_threads:
+            thread.start()
+        for thread in search_threads:
+            thread.join()
+
+        # Поиск закончен - сигнал потокам карточек завершиться после очереди
+        for _ in self.detail_threads:
+            self.detail_queue.put(None)
+        for thread in self.detail_threads:
+            thread.join()
+
+        # Если ни один поток карточек не запустился, результаты сохраняются без карточек
+        while not self.stop_event.is_set():
+            try:
+                item = self.detail_queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                self.finish(*item)
+
+        if self.error is not None:
+            raise self.error
+
+    def fail(self, error):
+        """Первая ошибка потока конвейера: остальные потоки останавливаются"""
+        print(f"Конвейер остановлен ошибкой: {type(error).__name__} {error}")
+        with self.lock:
+            if self.error is None:
+                self.error = error
+        self.stop_event.set()
+
+    def start_engine(self, stage, limiter):
+        try:
+            engine = self.engine_factory(limiter)
+        except Exception as e:
+            print(f"Ошибка запуска движка: {str(e)}")
+            with self.lock:
+                self.startup_errors[stage].append(str(e))
+            return None
+        with self.lock:
+            self.engines.append((stage, engine))
+            self.started[stage] += 1
+        return engine
+
+    def search_worker(self, source):
+        engine = self.start_engine('search', self.search_limiter)
+        if engine is None:
+            return
+        try:
+            while not self.stop_event.is_set():
+                task = source.get()
+                if task is None:
+                    break
+                index, inn = task
+
+                data, error = self.attempt('search', inn, engine.search, inn)
+                if self.stop_event.is_set():
+                    break
+                if error is not None:
+                    print(f"ИНН {inn} не проверен: {error}")
+                    self.finish(index, inn, None, error)
+                elif data and self.detail_threads and not has_details(data):
+                    self.detail_queue.put((index, inn, data))
+                else:
+                    self.finish(index, inn, data)
+        except Exception as e:
+            self.fail(e)
+        finally:
+            self.close_engine(engine)
+
+    def detail_worker(self):
+        engine = self.start_engine('detail', self.detail_limiter)
+        if engine is None:
+            return
+        try:
+            while not self.stop_event.is_set():
+                item = self.detail_queue.get()
+                if item is None:
+                    break
+                index, inn, data = item
+
+                detailed, error = self.attempt('details', inn, engine.fetch_details, inn, data)
+                if self.stop_event.is_set():
+                    break
+                if error is not None:
+                    # Оператор найден: результат остается без карточки, ее можно догрузить позже
+                    METRICS.increment('details.failed')
+                    print(f"Карточка для ИНН {inn} не загружена: {error}")
+                    detailed = data
+                self.finish(index, inn, detailed)
+        except Exception as e:
+            self.fail(e)
+        finally:
+            self.close_engine(engine)
+
+    def attempt(self, stage, inn, func, *args):
+        """(результат, None) или (None, причина ошибки) после повторов временных сбоев"""
+        for attempt in range(1, self.retry.attempts + 1):
+            try:
+                with METRICS.timer(f'pipeline.{stage}'):
+                    return func(*args), None
+            except Exception as e:
+                error = e
+            if self.stop_event.is_set() or not isinstance(error, TransientError):
+                break
+            if attempt == self.retry.attempts:
+                break
+            delay = self.retry.delay(attempt)
+            METRICS.increment(f'{stage}.retries')
+            print(f"Сбой для ИНН {inn} (попытка {attempt} из {self.retry.attempts}): {error}. "
+                  f"Повтор через {delay:.1f} с")
+            if self.stop_event.wait(delay):
+                break
+        return None, str(error)
+
+    def finish(self, index, inn, data, error=None):
+        if error is not None:
+            result = error_result(inn, error)
+            METRICS.increment('results.errors')
+        else:
+            result = {'inn': inn, 'data': data}
+            METRICS.increment('results.found' if data else 'results.not_found')
+        with self.lock:
+            if self.keep_results:
+                self.results[index] = result
+            self.completed += 1
+            completed = self.completed
+        if self.on_result:
+            self.on_result(index, result, completed, self.total)
+
+    def close_engine(self, engine):
+        with self.lock:
+            entries = [entry for entry in self.engines if entry[1] is engine]
+            if not entries:
+                return
+            self.engines.remove(entries[0])
+        try:
+            engine.close()
+        except Exception as e:
+            print(f"Ошибка при закрытии движка: {str(e)}")
+
+    def stop(self):
+        """Останавливает оба этапа и закрывает все движки"""
+        self.stop_event.set()
+        if self.detail_queue is not None:
+            for _ in self.detail_threads:
+                self.detail_queue.put(None)
+        with self.lock:
+            engines = [engine for _, engine in self.engines]
+        for engine in engines:
+            self.close_engine(engine)